@@ -4,10 +4,12 @@ Module for storing and retrieving delta snapshots for weekly/monthly tracking.
 Stores minimal differences instead of full files to save space.
 """
 
+import heapq
 import json
 import os
 from datetime import datetime, timedelta
 from collections import defaultdict
+from operator import itemgetter
 
 def get_week_start(date_str):
     """Get the Monday of the week for a given date (YYYY-MM-DD)."""
@@ -357,9 +359,8 @@ def get_weekly_leaderboard(week_start_date, stat_type='aa', top_n=20, base_dir='
                     'gain': gain
                 })
     
-    # Sort by gain (descending) and return top N
-    leaderboard.sort(key=lambda x: x['gain'], reverse=True)
-    return leaderboard[:top_n]
+    # Top N by gain (descending); partial selection instead of a full sort
+    return heapq.nlargest(top_n, leaderboard, key=itemgetter('gain'))
 
 def get_monthly_leaderboard(month_start_date, stat_type='aa', top_n=20, base_dir='delta_snapshots', current_char_data=None, end_date=None):
     """Get monthly leaderboard for AA or HP gains.
@@ -403,9 +404,8 @@ def get_monthly_leaderboard(month_start_date, stat_type='aa', top_n=20, base_dir
                     'gain': gain
                 })
     
-    # Sort by gain (descending) and return top N
-    leaderboard.sort(key=lambda x: x['gain'], reverse=True)
-    return leaderboard[:top_n]
+    # Top N by gain (descending); partial selection instead of a full sort
+    return heapq.nlargest(top_n, leaderboard, key=itemgetter('gain'))
 
 def save_master_baseline(char_data, inv_data, date_str, base_dir='delta_snapshots'):
     """Save a master baseline containing full character and inventory data.
@@ -440,7 +440,7 @@ def save_master_baseline(char_data, inv_data, date_str, base_dir='delta_snapshot
     # Note: Baseline is generated on-the-fly and cached, not committed to repo
     import gzip
     with gzip.open(compressed_filepath, 'wt', encoding='utf-8') as f:
-        json.dump(baseline_json, f, indent=2)
+        json.dump(baseline_json, f, separators=(',', ':'))
     
     # Also save uncompressed for local use (optional, can be removed)
     with open(filepath, 'w', encoding='utf-8') as f:
@@ -540,7 +540,7 @@ def save_daily_delta_from_baseline(current_char_data, current_inv_data, date_str
                     with open(uncompressed_file, 'r', encoding='utf-8') as f_in:
                         baseline_data = json.load(f_in)
                     with gzip.open(old_baseline_file, 'wt', encoding='utf-8') as f_out:
-                        json.dump(baseline_data, f_out, indent=2)
+                        json.dump(baseline_data, f_out, separators=(',', ':'))
             print(f"  Archived old baseline to: {os.path.basename(old_baseline_file)}")
             
             # Create new baseline from current data
@@ -581,14 +581,13 @@ def save_daily_delta_from_baseline(current_char_data, current_inv_data, date_str
             if item['item_id'] in all_item_ids:
                 item_names[item['item_id']] = item['item_name']
     
-    # Populate item names in deltas
+    # Store names for each delta's items in the saved JSON (compare_inventories no longer creates this map)
     for char_delta in inv_deltas.values():
-        for item_id in char_delta['added']:
-            if item_id in item_names:
-                char_delta['item_names'][item_id] = item_names[item_id]
-        for item_id in char_delta['removed']:
-            if item_id in item_names:
-                char_delta['item_names'][item_id] = item_names[item_id]
+        char_delta['item_names'] = {
+            item_id: item_names[item_id]
+            for item_id in (*char_delta['added'], *char_delta['removed'])
+            if item_id in item_names
+        }
     
     filename = f"delta_daily_{date_str}.json"
     filepath = os.path.join(base_dir, filename)
@@ -607,11 +606,12 @@ def save_daily_delta_from_baseline(current_char_data, current_inv_data, date_str
         'timestamp': datetime.now().isoformat()
     }
     
-    # Save as compressed JSON (gzip) to reduce storage by ~80%
+    # Save as compressed JSON (gzip) to reduce storage by ~80%; compact separators since the browser
+    # inflates and parses this file (indentation only costs bytes there), the .json copy stays readable
     import gzip
     compressed_filepath = filepath + '.gz'
     with gzip.open(compressed_filepath, 'wt', encoding='utf-8') as f:
-        json.dump(daily_delta, f, indent=2)
+        json.dump(daily_delta, f, separators=(',', ':'))
     
     # Also save uncompressed for easier debugging (optional - can remove later)
     with open(filepath, 'w', encoding='utf-8') as f:
@@ -807,8 +807,7 @@ def compare_delta_to_delta(delta_a, delta_b, baseline_characters=None):
     char_deltas = {}
     
     # Get all characters from both deltas
-    all_chars = set(list(delta_a.get('char_deltas', {}).keys()) + 
-                    list(delta_b.get('char_deltas', {}).keys()))
+    all_chars = delta_a.get('char_deltas', {}).keys() | delta_b.get('char_deltas', {}).keys()
     
     for char_name in all_chars:
         delta_a_char = delta_a.get('char_deltas', {}).get(char_name, {})
@@ -848,8 +847,7 @@ def compare_delta_to_delta(delta_a, delta_b, baseline_characters=None):
     
     # Inventory deltas: merge added/removed items
     inv_deltas = {}
-    all_inv_chars = set(list(delta_a.get('inv_deltas', {}).keys()) + 
-                        list(delta_b.get('inv_deltas', {}).keys()))
+    all_inv_chars = delta_a.get('inv_deltas', {}).keys() | delta_b.get('inv_deltas', {}).keys()
     
     for char_name in all_inv_chars:
         delta_a_inv = delta_a.get('inv_deltas', {}).get(char_name, {'added': {}, 'removed': {}, 'item_names': {}})
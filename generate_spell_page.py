@@ -4,12 +4,25 @@ Script to generate a static HTML page showing which mule characters have
 spells from PoK turn-ins (items 29112, 29131, 29132).
 """
 
+import hashlib
+import heapq
 import json
 import math
+import mmap
 import os
 import re
-from collections import defaultdict
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+try:
+    import orjson  # optional: faster JSON for the spell exchange list and embedded page data
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 from delta_storage import (
     save_delta_snapshot, load_delta_snapshot,
     get_week_start, get_month_start,
@@ -30,12 +43,21 @@ MULE_CHARACTERS = [
     "Bardboy", "Clericboy", "Druidboy", "Enchanterboy",
     "Magicianboy", "Necromancerboy", "Paladinboy", "Shamanboy"
 ]
+MULE_CHARACTERS_SET = frozenset(MULE_CHARACTERS)  # for per-row membership tests
+_MULE_DISPLAY_ORDER = tuple(sorted(MULE_CHARACTERS))  # section order on the spell page
 
 # GoatCounter analytics snippet (included in all generated HTML pages)
 GOATCOUNTER_SCRIPT = '''    <script data-goatcounter="https://ammordius.goatcounter.com/count"
             async src="//gc.zgo.at/count.js"></script>
 '''
 
+# HTML escaping table for names interpolated into generated pages (str.translate runs in C)
+_ESC = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+def esc(s):
+    """Escape a name for safe interpolation into HTML text or a quoted attribute."""
+    return s.translate(_ESC)
+
 # Officer mule characters
 OFFICER_MULE_CHARACTERS = [
     "Nagalchpoistink", "Nagbaker", "Nagbows", "Nagbrew",
@@ -43,28 +65,35 @@ OFFICER_MULE_CHARACTERS = [
     "Gemsdaddy", "Incharge", "Overflow", "Overflowfive",
     "Overflowfour", "Overflowthree", "Overflowtwo", "Slushfund"
 ]
+OFFICER_MULE_CHARACTERS_SET = frozenset(OFFICER_MULE_CHARACTERS)
+_OFFICER_MULE_DISPLAY_ORDER = tuple(sorted(OFFICER_MULE_CHARACTERS))
 
-def load_spell_exchange_data():
-    """Load the spell exchange JSON data and extract all spell IDs."""
-    # Try multiple possible locations
+def _spell_exchange_paths():
+    """Candidate locations for spell_exchange_list.json, in priority order."""
     base_dir = os.path.dirname(__file__)
-    possible_paths = [
+    return [
         os.path.join(base_dir, "spell_exchange_list.json"),  # Same directory
         os.path.join(base_dir, "..", "quests", "poknowledge", "spell_exchange_list.json"),  # Relative path
         os.path.join(base_dir, "..", "..", "quests", "poknowledge", "spell_exchange_list.json"),  # Alternative relative
     ]
-    
-    json_path = None
-    for path in possible_paths:
+
+def find_spell_exchange_json():
+    """Return the path of spell_exchange_list.json, or None if not found."""
+    for path in _spell_exchange_paths():
         if os.path.exists(path):
-            json_path = path
-            break
-    
+            return path
+    return None
+
+def load_spell_exchange_data():
+    """Load the spell exchange JSON data and extract all spell IDs."""
+    # Try multiple possible locations
+    json_path = find_spell_exchange_json()
     if json_path is None:
-        raise FileNotFoundError(f"Could not find spell_exchange_list.json. Tried: {possible_paths}")
+        raise FileNotFoundError(f"Could not find spell_exchange_list.json. Tried: {_spell_exchange_paths()}")
     
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    data = orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
     
     # Extract all spell IDs and create a mapping
     spell_info = {}  # spell_id -> {name, npc, class, item_type}
@@ -75,24 +104,49 @@ def load_spell_exchange_data():
             npc_name = npc_data['npc']
             npc_class = npc_data['class']
             for spell_id, spell_name in zip(npc_data['spells'], npc_data['spell_names']):
-                spell_id_str = str(spell_id)
-                if spell_id_str not in spell_info:
-                    spell_info[spell_id_str] = {
-                        'name': spell_name,
-                        'npcs': [],
-                        'item_types': []
-                    }
-                spell_info[spell_id_str]['npcs'].append({
+                entry = spell_info.setdefault(str(spell_id), {
+                    'name': spell_name,
+                    'npcs': [],
+                    'item_types': set()
+                })
+                entry['npcs'].append({
                     'npc': npc_name,
                     'class': npc_class,
                     'item_id': item_id,
                     'item_name': item_name
                 })
-                if item_name not in spell_info[spell_id_str]['item_types']:
-                    spell_info[spell_id_str]['item_types'].append(item_name)
+                entry['item_types'].add(item_name)
+    
+    # Freeze item types into a sorted tuple for a deterministic order
+    for entry in spell_info.values():
+        entry['item_types'] = tuple(sorted(entry['item_types']))
     
     return spell_info, data
 
+# Tag written into spell_inventory.html so unchanged inputs can skip regeneration
+_INPUT_HASH_RE = re.compile(r'<meta name="input-hash" content="([0-9a-f]+)">')
+
+def compute_input_hash(paths, extra=''):
+    """SHA-256 over the given files (read in 1 MiB chunks) plus an extra string."""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        h.update(b'\0')
+    h.update(extra.encode('utf-8'))
+    return h.hexdigest()
+
+def read_output_input_hash(output_file):
+    """Return the input hash stored in a previously generated page, or None."""
+    try:
+        with open(output_file, 'r', encoding='utf-8') as f:
+            head = f.read(4096)
+    except OSError:
+        return None
+    match = _INPUT_HASH_RE.search(head)
+    return match.group(1) if match else None
+
 def parse_character_file(char_file, character_list):
     """Parse character file to get character IDs for specified characters."""
     char_ids = {}
@@ -100,13 +154,14 @@ def parse_character_file(char_file, character_list):
         # Skip header
         next(f)
         for line in f:
-            parts = line.strip().split('\t')
+            # Only name (0) and id (8) are used; cap the split so the tail stays one string
+            parts = line.strip().split('\t', 9)
             if len(parts) < 9:
                 continue
             name = parts[0]
             if name in character_list:
-                char_id = parts[8]  # 9th column (0-indexed = 8)
-                char_ids[name] = char_id
+                char_id = sys.intern(parts[8])  # 9th column (0-indexed = 8)
+                char_ids[sys.intern(name)] = char_id
     return char_ids
 
 def parse_character_data(char_file, character_list):
@@ -117,14 +172,15 @@ def parse_character_data(char_file, character_list):
         # Skip header
         header = next(f).strip().split('\t')
         for line in f:
-            parts = line.strip().split('\t')
+            # Highest column read is 28 (hp_max_total)
+            parts = line.strip().split('\t', 29)
             if len(parts) < 12:
                 continue
             name = parts[0]
             if character_list is None or name in character_list:
                 try:
-                    char_data[name] = {
-                        'id': parts[8] if len(parts) > 8 else '',
+                    char_data[sys.intern(name)] = {
+                        'id': sys.intern(parts[8]) if len(parts) > 8 else '',
                         'level': int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else 0,
                         'aa_unspent': int(parts[10]) if len(parts) > 10 and parts[10].isdigit() else 0,
                         'aa_spent': int(parts[11]) if len(parts) > 11 and parts[11].isdigit() else 0,
@@ -138,31 +194,69 @@ def parse_character_data(char_file, character_list):
     return char_data
 
 def parse_inventory_file(inv_file, char_ids):
-    """Parse inventory file to get items for each character."""
+    """Parse inventory file to get items for each character.
+    Rows stay plain dicts: they are written as-is into the master baseline JSON and
+    compared against baselines loaded back from disk (see delta_storage)."""
     inventories = defaultdict(list)
-    char_id_to_name = {v: k for k, v in char_ids.items()}
+    # Match on raw bytes so only rows for requested characters are decoded
+    char_id_to_name = {v.encode('utf-8'): k for k, v in char_ids.items()}
     
-    with open(inv_file, 'r', encoding='utf-8') as f:
-        # Skip header
-        next(f)
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) < 4:
-                continue
-            char_id = parts[0]
-            if char_id in char_id_to_name:
-                slot_id = parts[1]
-                item_id = parts[2]
-                item_name = parts[3] if len(parts) > 3 else ""
-                char_name = char_id_to_name[char_id]
+    with open(inv_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return inventories
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Skip header
+            mm.readline()
+            for line in iter(mm.readline, b''):
+                # Only the first four columns are used
+                parts = line.strip().split(b'\t', 4)
+                if len(parts) < 4:
+                    continue
+                # One hash lookup both filters the row and resolves the character
+                char_name = char_id_to_name.get(parts[0])
+                if char_name is None:
+                    continue
+                _, slot_id, item_id, item_name = parts[:4]
+                # Same ids/names recur across characters; intern so each is stored once
                 inventories[char_name].append({
-                    'slot_id': slot_id,
-                    'item_id': item_id,
-                    'item_name': item_name
+                    'slot_id': slot_id.decode('utf-8'),
+                    'item_id': sys.intern(item_id.decode('utf-8')),
+                    'item_name': sys.intern(item_name.decode('utf-8'))
                 })
     
     return inventories
 
+def parse_all_character_ids(char_file):
+    """Map every character name in the export to its character id (serverwide)."""
+    char_ids = {}
+    with open(char_file, 'r', encoding='utf-8') as f:
+        next(f)  # Skip header
+        for line in f:
+            parts = line.strip().split('\t', 9)
+            if len(parts) >= 9:
+                char_ids[sys.intern(parts[0])] = sys.intern(parts[8])
+    return char_ids
+
+def _parse_serverwide_export(files):
+    """Parse one (character file, inventory file) pair for all characters.
+    Top-level so it can run in a worker process; returns (char_data, inventories)."""
+    char_file, inv_file = files
+    char_data = parse_character_data(char_file, None)
+    char_ids = parse_all_character_ids(char_file)
+    inventories = parse_inventory_file(inv_file, char_ids) if char_ids else {}
+    return char_data, inventories
+
+def parse_serverwide_exports(file_pairs):
+    """Parse several (character file, inventory file) pairs, one process per pair.
+    Falls back to parsing in this process if worker processes are unavailable."""
+    if len(file_pairs) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=len(file_pairs)) as pool:
+                return list(pool.map(_parse_serverwide_export, file_pairs))
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"[WARNING] Parallel parse unavailable ({e}), parsing serially")
+    return [_parse_serverwide_export(pair) for pair in file_pairs]
+
 def get_spell_sort_key(spell_id, spell_info):
     """Get sort key for a spell: (class_order, item_type_order, spell_name)"""
     spell_data = spell_info[spell_id]
@@ -191,88 +285,91 @@ def get_spell_sort_key(spell_id, spell_info):
     spell_name = spell_data['name']
     return (class_order, item_type_order, spell_name)
 
-def generate_html(char_ids, inventories, spell_info, officer_char_ids=None, officer_inventories=None):
-    """Generate the HTML page."""
-    
-    # Find PoK spells in inventories
-    pok_spells = defaultdict(lambda: defaultdict(int))  # char -> spell_id -> count
-    all_items = defaultdict(list)
-    pok_spell_ids = set(spell_info.keys())
-    
+def _scan_pok_spells(inventories, pok_spell_ids):
+    """Count PoK spells per character. Only characters that hold a spell get an entry."""
+    pok_spells = {}  # char -> Counter(spell_id -> count)
     for char_name, items in inventories.items():
-        for item in items:
-            item_id = item['item_id']
-            all_items[char_name].append(item)
-            if item_id in pok_spell_ids:
-                pok_spells[char_name][item_id] += 1
+        # Count every id in C, then intersect the distinct ids with the PoK set
+        # instead of testing membership once per item
+        counts = Counter(item['item_id'] for item in items)
+        matched = counts.keys() & pok_spell_ids
+        if matched:
+            pok_spells[char_name] = Counter({sid: counts[sid] for sid in sorted(matched)})
+    return pok_spells
+
+# Repeated per-row fragments of the spell page, filled with str.format
+_SPELL_ITEM_TMPL = """
+                <div class="spell-item">
+                    <a href="https://www.takproject.net/allaclone/item.php?id={sid}" target="_blank">{name}</a>
+                    <span class="spell-count">x{count}</span>
+                </div>
+"""
+_OTHER_ITEM_TMPL = '<div class="other-item"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2196F3; text-decoration: none;">{name}</a>{count_text}</div>'
+_SPELL_CARD_TMPL = """
+            <div class="spell-card {card_class}">
+                <div class="spell-name">
+                    <a href="https://www.takproject.net/allaclone/item.php?id={sid}" target="_blank">{name}</a>
+"""
+_CHAR_ITEM_TMPL = '<span class="char-item">{char_name}<span class="count">x{count}</span></span>'
+
+def _build_char_section(args):
+    """Build the HTML section for one mule: PoK spells held plus other items.
+    Takes a single (char_name, char_spells, items, spell_info, spell_sort_keys, pok_spell_ids)
+    tuple and depends on nothing but its arguments, so it can be mapped over characters."""
+    char_name, char_spells, items, spell_info, spell_sort_keys, pok_spell_ids = args
+    has_spells = bool(char_spells)
+    section_class = "has-spells" if has_spells else "no-spells"
     
-    # Process officer mules if provided
-    officer_pok_spells = defaultdict(lambda: defaultdict(int))
-    officer_all_items = defaultdict(list)
-    if officer_inventories:
-        for char_name, items in officer_inventories.items():
-            for item in items:
-                item_id = item['item_id']
-                officer_all_items[char_name].append(item)
-                if item_id in pok_spell_ids:
-                    officer_pok_spells[char_name][item_id] += 1
+    parts = [f"""
+        <div class="character-section {section_class}">
+            <h3>{char_name}</h3>
+"""]
     
-    # Build item search index: item_id -> {name, chars: [(char_name, count), ...]}
-    # Includes all items on regular mules and officer mules (for search/autocomplete)
-    item_search_index = {}
-    for char_name, items in all_items.items():
+    if has_spells:
+        parts.append(f"<p><strong>PoK Spells Found: {char_spells.total()} total</strong></p>")
+        parts.append('<div class="spell-list">')
+        # Sort by class, item type, then name
+        sorted_spells = sorted(char_spells.items(), key=lambda x: spell_sort_keys[x[0]])
+        spell_row = _SPELL_ITEM_TMPL.format
+        parts.append(''.join(spell_row(sid=spell_id, name=esc(spell_info[spell_id]['name']), count=count)
+                             for spell_id, count in sorted_spells))
+        parts.append('</div>')
+    else:
+        parts.append("<p><em>No PoK spells found.</em></p>")
+    
+    # Show other items (non-PoK spells) - grouped by item_id
+    if items is not None:
+        # Group items by item_id and count in one pass; the name is stored once per id
+        item_counts = Counter()
+        item_names = {}
         for item in items:
             item_id = item['item_id']
-            item_name = (item.get('item_name') or '').strip()
-            if not item_id:
+            if item_id in pok_spell_ids:
                 continue
-            if item_id not in item_search_index:
-                item_search_index[item_id] = {'name': item_name, 'chars': defaultdict(int)}
-            item_search_index[item_id]['chars'][char_name] += 1
-    if officer_all_items:
-        for char_name, items in officer_all_items.items():
-            for item in items:
-                item_id = item['item_id']
-                item_name = (item.get('item_name') or '').strip()
-                if not item_id:
-                    continue
-                if item_id not in item_search_index:
-                    item_search_index[item_id] = {'name': item_name, 'chars': defaultdict(int)}
-                item_search_index[item_id]['chars'][char_name] += 1
-    # Convert chars to sorted list of (char_name, count) for JSON
-    item_search_list = []
-    all_item_names_for_autocomplete = []
-    for item_id, data in item_search_index.items():
-        chars_list = sorted(data['chars'].items(), key=lambda x: (-x[1], x[0]))
-        item_search_list.append({
-            'id': item_id,
-            'name': data['name'],
-            'chars': chars_list
-        })
-        if data['name']:
-            all_item_names_for_autocomplete.append(data['name'])
-    # Safe for embedding in <script>: avoid closing tag
-    def script_safe(s):
-        return s.replace("</", "<\\/")
-    item_search_json = script_safe(json.dumps(item_search_list, ensure_ascii=False))
-    autocomplete_names_json = script_safe(json.dumps(sorted(set(all_item_names_for_autocomplete)), ensure_ascii=False))
-    
-    # Create reverse mapping: spell_id -> list of characters who have it
-    spell_to_chars = defaultdict(list)
-    for char_name, spells in pok_spells.items():
-        for spell_id, count in spells.items():
-            spell_to_chars[spell_id].append((char_name, count))
-    
-    # Get magelo update date from environment variable or use default
-    magelo_update_date = os.environ.get('MAGELO_UPDATE_DATE', 'Unknown')
+            item_counts[item_id] += 1
+            if item_id not in item_names:
+                item_names[item_id] = item['item_name']
+        if item_counts:
+            parts.append(f"""
+                <div class="other-items">
+                    <h4>Other Items ({item_counts.total()} total, {len(item_counts)} unique)</h4>
+                    <div class="other-items-list">
+""")
+            # Sort by name, then by count; only the first 200 unique items are shown, so partial-sort
+            top_items = heapq.nsmallest(200, item_counts.items(), key=lambda x: (item_names[x[0]], -x[1]))
+            other_row = _OTHER_ITEM_TMPL.format
+            parts.append(''.join(other_row(item_id=item_id, name=esc(item_names[item_id]),
+                                           count_text=f" x{count}" if count > 1 else "")
+                                 for item_id, count in top_items))
+            if len(item_counts) > len(top_items):
+                parts.append(f'<div class="other-item"><em>... and {len(item_counts) - len(top_items)} more unique items</em></div>')
+            parts.append("</div></div>")
     
-    html = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TAKP Mule PoK Spell Inventory</title>
-    <style>
+    parts.append("</div>")
+    return ''.join(parts)
+
+# Stylesheet for the spell inventory page (generate_html)
+_SPELL_PAGE_CSS = """    <style>
         body {
             font-family: Arial, sans-serif;
             margin: 20px;
@@ -550,35 +647,47 @@ def generate_html(char_ids, inventories, spell_info, officer_char_ids=None, offi
             margin-top: 10px;
         }
     </style>
-</head>
-<body>
-    <div class="container">
-        <h1>TAKP Mule PoK Spell Inventory</h1>
-        <p>Generated from magelo dump (last updated: """ + magelo_update_date + """)</p>
-        <p>This page shows spells that can be obtained from PoK turn-ins (Ethereal Parchment, Spectral Parchment, Glyphed Rune Word)</p>
-        
-        <div class="search-inventory">
-            <h2>Search mule inventory</h2>
-            <p style="margin: 0 0 10px 0; color: #555; font-size: 0.95em;">Type to search items on mules. Autocomplete suggests item names; partial text matches multiple items (e.g. "ring" shows all items containing "ring").</p>
-            <div class="search-inventory-wrap">
-                <input type="text" id="item-search-input" placeholder="Item name (e.g. ring, parchment)..." autocomplete="off" />
-                <ul class="autocomplete-list" id="autocomplete-list" style="display: none;"></ul>
-            </div>
-            <div class="search-results" id="search-results"></div>
-        </div>
-        
-        <div class="summary">
-            <h2>Summary</h2>
-            <div class="summary-stats">
 """
-    
+
+# Collection status card per class; one bar block per PoK item type (filled with str.format_map)
+_STATUS_ITEM_TYPES = (
+    ('Ethereal Parchment', 'Ethereal Parchment (EP)'),
+    ('Spectral Parchment', 'Spectral Parchment (SP)'),
+    ('Glyphed Rune Word', 'Glyphed Rune Word (Rune)'),
+)
+_STATUS_BAR_TMPL = """                    <div style="margin: 10px 0;">
+                        <div style="font-weight: bold; margin-bottom: 5px;">{label}:</div>
+                        <div style="background-color: #f0f0f0; border-radius: 3px; padding: 5px; margin-bottom: 5px;">
+                            <div style="background-color: {bar_color}; height: 20px; width: {pct}%; border-radius: 3px; transition: width 0.3s;"></div>
+                        </div>
+                        <div style="font-size: 0.9em; color: #666;">{found}/{total} found ({pct}%) - <strong style="color: {missing_color}">{missing} missing</strong></div>
+                    </div>
+"""
+_STATUS_CARD_TMPL = """
+                <div style="background-color: white; padding: 15px; border-radius: 5px; border: 1px solid #ddd;">
+                    <h3 style="margin-top: 0; color: #1976D2;"><a href="#class-{class_anchor}" style="color: #1976D2; text-decoration: none;">{class_name}</a></h3>
+{bars}                    <div style="margin-top: 10px; padding-top: 10px; border-top: 1px solid #ddd; font-weight: bold; color: #333;">
+                        Total: {found}/{total} spells found
+                    </div>
+                </div>
+"""
+
+def render_summary(pok_spells):
+    """Summary stat boxes for the regular mules."""
     # Calculate summary stats
     total_chars = len(MULE_CHARACTERS)
-    chars_with_spells = sum(1 for char in MULE_CHARACTERS if pok_spells[char])
-    total_unique_spells = len([s for s in pok_spell_ids if any(pok_spells[char].get(s) for char in MULE_CHARACTERS)])
-    total_spell_items = sum(sum(pok_spells[char].values()) for char in MULE_CHARACTERS)
+    chars_with_spells = sum(1 for char in MULE_CHARACTERS if char in pok_spells)
+    found_spells = set()
+    for char in MULE_CHARACTERS:
+        found_spells.update(pok_spells.get(char, ()))
+    total_unique_spells = len(found_spells)
+    total_spell_items = sum(pok_spells[char].total() for char in MULE_CHARACTERS if char in pok_spells)
     
-    html += f"""
+    return f"""        
+        <div class="summary">
+            <h2>Summary</h2>
+            <div class="summary-stats">
+
                 <div class="stat-box">
                     <div class="stat-number">{total_chars}</div>
                     <div>Total Characters</div>
@@ -597,347 +706,316 @@ def generate_html(char_ids, inventories, spell_info, officer_char_ids=None, offi
                 </div>
             </div>
         </div>
-        
-        <h2>All PoK Spells</h2>
-        <p>Spells are grouped by class and item type. Found spells are shown in green, missing spells in red. Click spell names to view on TAKProject.</p>
 """
-    
-    # Get all unique classes for navigation
-    all_classes = set()
-    for spell_id in pok_spell_ids:
-        if spell_info[spell_id]['npcs']:
-            all_classes.add(spell_info[spell_id]['npcs'][0]['class'])
-    
-    # Calculate status counts per class and item type
-    class_status = defaultdict(lambda: {
-        'Ethereal Parchment': {'total': 0, 'found': 0},
-        'Spectral Parchment': {'total': 0, 'found': 0},
-        'Glyphed Rune Word': {'total': 0, 'found': 0}
-    })
-    
-    for spell_id in pok_spell_ids:
-        spell_data = spell_info[spell_id]
-        if spell_data['npcs']:
-            npc_info = spell_data['npcs'][0]
-            class_name = npc_info['class']
-            item_name = npc_info['item_name']
-            is_found = bool(spell_to_chars.get(spell_id, []))
-            
-            class_status[class_name][item_name]['total'] += 1
-            if is_found:
-                class_status[class_name][item_name]['found'] += 1
+
+def render_class_status(all_classes, class_index, anchors):
+    """Collection status cards: found/total per PoK item type for each class."""
+    parts = []
+    # Calculate status counts per (class, item type) in two flat Counters
+    totals = Counter()
+    founds = Counter()
+    for rows in class_index.values():
+        totals.update((class_name, item_name) for class_name, item_name, _, _ in rows)
+        founds.update((class_name, item_name) for class_name, item_name, _, is_found in rows if is_found)
     
     # Add status indicator section
-    html += """
+    parts.append("""
         <div style="background-color: #fff3cd; padding: 20px; border-radius: 5px; margin: 20px 0; border: 2px solid #ffc107;">
             <h2 style="margin-top: 0; color: #f57c00;">Collection Status by Class</h2>
             <p style="margin-bottom: 15px;">Use this to see which spells are missing and help complete the collection!</p>
             <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px;">
-"""
+""")
     
     for class_name in sorted(all_classes):
-        status = class_status[class_name]
-        ep_total = status['Ethereal Parchment']['total']
-        ep_found = status['Ethereal Parchment']['found']
-        ep_missing = ep_total - ep_found
-        ep_pct = int((ep_found / ep_total * 100)) if ep_total > 0 else 0
-        
-        sp_total = status['Spectral Parchment']['total']
-        sp_found = status['Spectral Parchment']['found']
-        sp_missing = sp_total - sp_found
-        sp_pct = int((sp_found / sp_total * 100)) if sp_total > 0 else 0
-        
-        rune_total = status['Glyphed Rune Word']['total']
-        rune_found = status['Glyphed Rune Word']['found']
-        rune_missing = rune_total - rune_found
-        rune_pct = int((rune_found / rune_total * 100)) if rune_total > 0 else 0
-        
-        class_anchor = class_name.lower().replace(' ', '-')
-        html += f"""
-                <div style="background-color: white; padding: 15px; border-radius: 5px; border: 1px solid #ddd;">
-                    <h3 style="margin-top: 0; color: #1976D2;"><a href="#class-{class_anchor}" style="color: #1976D2; text-decoration: none;">{class_name}</a></h3>
-                    <div style="margin: 10px 0;">
-                        <div style="font-weight: bold; margin-bottom: 5px;">Ethereal Parchment (EP):</div>
-                        <div style="background-color: #f0f0f0; border-radius: 3px; padding: 5px; margin-bottom: 5px;">
-                            <div style="background-color: {'#4CAF50' if ep_found == ep_total else '#ff9800' if ep_found > 0 else '#f44336'}; height: 20px; width: {ep_pct}%; border-radius: 3px; transition: width 0.3s;"></div>
-                        </div>
-                        <div style="font-size: 0.9em; color: #666;">{ep_found}/{ep_total} found ({ep_pct}%) - <strong style="color: {'#4CAF50' if ep_missing == 0 else '#f44336'}">{ep_missing} missing</strong></div>
-                    </div>
-                    <div style="margin: 10px 0;">
-                        <div style="font-weight: bold; margin-bottom: 5px;">Spectral Parchment (SP):</div>
-                        <div style="background-color: #f0f0f0; border-radius: 3px; padding: 5px; margin-bottom: 5px;">
-                            <div style="background-color: {'#4CAF50' if sp_found == sp_total else '#ff9800' if sp_found > 0 else '#f44336'}; height: 20px; width: {sp_pct}%; border-radius: 3px; transition: width 0.3s;"></div>
-                        </div>
-                        <div style="font-size: 0.9em; color: #666;">{sp_found}/{sp_total} found ({sp_pct}%) - <strong style="color: {'#4CAF50' if sp_missing == 0 else '#f44336'}">{sp_missing} missing</strong></div>
-                    </div>
-                    <div style="margin: 10px 0;">
-                        <div style="font-weight: bold; margin-bottom: 5px;">Glyphed Rune Word (Rune):</div>
-                        <div style="background-color: #f0f0f0; border-radius: 3px; padding: 5px; margin-bottom: 5px;">
-                            <div style="background-color: {'#4CAF50' if rune_found == rune_total else '#ff9800' if rune_found > 0 else '#f44336'}; height: 20px; width: {rune_pct}%; border-radius: 3px; transition: width 0.3s;"></div>
-                        </div>
-                        <div style="font-size: 0.9em; color: #666;">{rune_found}/{rune_total} found ({rune_pct}%) - <strong style="color: {'#4CAF50' if rune_missing == 0 else '#f44336'}">{rune_missing} missing</strong></div>
-                    </div>
-                    <div style="margin-top: 10px; padding-top: 10px; border-top: 1px solid #ddd; font-weight: bold; color: #333;">
-                        Total: {ep_found + sp_found + rune_found}/{ep_total + sp_total + rune_total} spells found
-                    </div>
-                </div>
-"""
+        bars = []
+        class_found = class_total = 0
+        for item_type, label in _STATUS_ITEM_TYPES:
+            total = totals[class_name, item_type]
+            found = founds[class_name, item_type]
+            class_found += found
+            class_total += total
+            missing = total - found
+            bars.append(_STATUS_BAR_TMPL.format_map({
+                'label': label,
+                'bar_color': '#4CAF50' if found == total else '#ff9800' if found > 0 else '#f44336',
+                'pct': int((found / total * 100)) if total > 0 else 0,
+                'found': found,
+                'total': total,
+                'missing_color': '#4CAF50' if missing == 0 else '#f44336',
+                'missing': missing,
+            }))
+        parts.append(_STATUS_CARD_TMPL.format_map({
+            'class_anchor': anchors[class_name],
+            'class_name': class_name,
+            'bars': ''.join(bars),
+            'found': class_found,
+            'total': class_total,
+        }))
     
-    html += """
+    parts.append("""
             </div>
         </div>
-"""
-    
+""")
+    return ''.join(parts)
+
+def render_spell_grid(spell_rows, spell_info, spell_to_chars, all_classes, anchors, spell_sort_keys):
+    """Class navigation plus the card grid of every PoK spell, found or missing."""
+    parts = []
     # Add class navigation
-    html += '<div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0;"><strong>Jump to Class:</strong> '
+    parts.append('<div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0;"><strong>Jump to Class:</strong> ')
     class_links = []
     for class_name in sorted(all_classes):
-        class_anchor = class_name.lower().replace(' ', '-')
+        class_anchor = anchors[class_name]
         class_links.append(f'<a href="#class-{class_anchor}" style="color: #1976D2; text-decoration: none; margin: 0 10px; padding: 5px 10px; background-color: white; border-radius: 3px;">{class_name}</a>')
-    html += ' '.join(class_links)
-    html += '</div>'
-    
-    # Combine all spells into one list
-    all_spells = []
-    
-    for spell_id in pok_spell_ids:
-        spell_data = spell_info[spell_id]
-        chars_with_this_spell = spell_to_chars.get(spell_id, [])
-        
-        spell_entry = {
-            'id': spell_id,
-            'name': spell_data['name'],
-            'npcs': spell_data['npcs'],
-            'chars': chars_with_this_spell,
-            'found': bool(chars_with_this_spell)
-        }
-        
-        all_spells.append(spell_entry)
+    parts.append(' '.join(class_links))
+    parts.append('</div>')
     
     # Sort by class, then item type, then name
-    all_spells.sort(key=lambda x: get_spell_sort_key(x['id'], spell_info))
+    spell_rows = sorted(spell_rows, key=lambda row: spell_sort_keys[row[2]])
     
     # Display all spells together
-    found_count = sum(1 for s in all_spells if s['found'])
-    not_found_count = sum(1 for s in all_spells if not s['found'])
-    html += '<div class="group-header">All PoK Spells (Found: ' + str(found_count) + ', Not Found: ' + str(not_found_count) + ')</div>'
-    html += '<div class="spell-grid">'
+    found_count = sum(1 for row in spell_rows if row[3])
+    not_found_count = len(spell_rows) - found_count
+    parts.append('<div class="group-header">All PoK Spells (Found: ' + str(found_count) + ', Not Found: ' + str(not_found_count) + ')</div>')
+    parts.append('<div class="spell-grid">')
     current_class = None
     current_item_type = None
     
-    for spell in all_spells:
-        # Get primary class and item type for this spell
-        if spell['npcs']:
-            npc_info = spell['npcs'][0]
-            spell_class = npc_info['class']
-            item_type = npc_info['item_name']
-            
+    for spell_class, item_type, spell_id, found in spell_rows:
+        spell_data = spell_info[spell_id]
+        # Primary class and item type for this spell (None when it has no NPCs)
+        if spell_class is not None:
             if spell_class != current_class:
                 if current_class is not None:
-                    html += '</div>'  # Close previous class group
-                class_anchor = spell_class.lower().replace(' ', '-')
-                html += f'<div id="class-{class_anchor}" style="grid-column: 1 / -1; margin-top: 20px;"><h3 style="color: #1976D2; border-bottom: 2px solid #1976D2; padding-bottom: 5px;">{spell_class}</h3></div>'
-                html += '<div class="spell-grid" style="grid-column: 1 / -1;">'
+                    parts.append('</div>')  # Close previous class group
+                class_anchor = anchors[spell_class]
+                parts.append(f'<div id="class-{class_anchor}" style="grid-column: 1 / -1; margin-top: 20px;"><h3 style="color: #1976D2; border-bottom: 2px solid #1976D2; padding-bottom: 5px;">{spell_class}</h3></div>')
+                parts.append('<div class="spell-grid" style="grid-column: 1 / -1;">')
                 current_class = spell_class
                 current_item_type = None  # Reset item type when class changes
             
             if item_type != current_item_type:
-                html += f'<div style="grid-column: 1 / -1; margin-top: 10px; margin-bottom: 5px;"><strong style="color: #555; font-size: 1.05em;">{item_type}</strong></div>'
+                parts.append(f'<div style="grid-column: 1 / -1; margin-top: 10px; margin-bottom: 5px;"><strong style="color: #555; font-size: 1.05em;">{item_type}</strong></div>')
                 current_item_type = item_type
         
         # Choose card style based on whether spell is found
-        card_class = "has-spell" if spell['found'] else "no-spell"
+        card_class = "has-spell" if found else "no-spell"
         
-        html += f"""
-            <div class="spell-card {card_class}">
-                <div class="spell-name">
-                    <a href="https://www.takproject.net/allaclone/item.php?id={spell['id']}" target="_blank">{spell['name']}</a>
-"""
-        if not spell['found']:
-            html += '<span style="color: #c62828; font-size: 0.9em; margin-left: 10px;">(Not Found)</span>'
-        html += """
+        parts.append(_SPELL_CARD_TMPL.format(card_class=card_class, sid=spell_id, name=esc(spell_data['name'])))
+        if not found:
+            parts.append('<span style="color: #c62828; font-size: 0.9em; margin-left: 10px;">(Not Found)</span>')
+        parts.append("""
                 </div>
-"""
+""")
         # Only show "Available from" for not found spells
-        if not spell['found']:
-            html += """
+        if not found:
+            parts.append("""
                 <div class="spell-sources">
                     <strong>Available from:</strong><br>
-"""
+""")
             # Group NPCs by class
             npcs_by_class = defaultdict(list)
-            for npc_info in spell['npcs']:
+            for npc_info in spell_data['npcs']:
                 npcs_by_class[npc_info['class']].append(npc_info)
             
             for npc_class in sorted(npcs_by_class.keys()):
-                html += f"<strong>{npc_class}:</strong> "
+                parts.append(f"<strong>{npc_class}:</strong> ")
                 npc_names = []
                 for npc_info in npcs_by_class[npc_class]:
-                    npc_names.append(f"{npc_info['npc']} ({npc_info['item_name']})")
-                html += ", ".join(npc_names) + "<br>"
+                    npc_names.append(f"{esc(npc_info['npc'])} ({esc(npc_info['item_name'])})")
+                parts.append(", ".join(npc_names) + "<br>")
             
-            html += """
+            parts.append("""
                 </div>
-"""
-        if spell['found']:
-            html += """
+""")
+        if found:
+            parts.append("""
                 <div class="char-list">
                     <strong>Found on:</strong><br>
-"""
-            for char_name, count in sorted(spell['chars']):
-                html += f'<span class="char-item">{char_name}<span class="count">x{count}</span></span>'
+""")
+            for char_name, count in spell_to_chars[spell_id]:
+                parts.append(_CHAR_ITEM_TMPL.format(char_name=char_name, count=count))
             
-            html += """
+            parts.append("""
                 </div>
-"""
-        html += """
+""")
+        parts.append("""
             </div>
-"""
+""")
     
     if current_class is not None:
-        html += '</div>'  # Close last class group
-    html += '</div>'
-    
+        parts.append('</div>')  # Close last class group
+    parts.append('</div>')
+    return ''.join(parts)
+
+def render_character_sections(char_ids, pok_spells, inventories, spell_info, spell_sort_keys, pok_spell_ids,
+                              officer_char_ids=None, officer_pok_spells=None, officer_inventories=None):
+    """Per-character sections for the mules, then the officer mules when provided."""
+    parts = []
     # Character-by-character breakdown
-    html += """
+    parts.append("""
         <h2>Spells by Character</h2>
-"""
+""")
     
-    for char_name in sorted([c for c in MULE_CHARACTERS if c in char_ids]):
-        char_spells = pok_spells[char_name]
-        has_spells = bool(char_spells)
-        section_class = "has-spells" if has_spells else "no-spells"
-        
-        html += f"""
-        <div class="character-section {section_class}">
-            <h3>{char_name}</h3>
-"""
-        
-        if has_spells:
-            html += f"<p><strong>PoK Spells Found: {sum(char_spells.values())} total</strong></p>"
-            html += '<div class="spell-list">'
-            # Sort by class, item type, then name
-            sorted_spells = sorted(char_spells.items(), key=lambda x: get_spell_sort_key(x[0], spell_info))
-            for spell_id, count in sorted_spells:
-                spell_data = spell_info[spell_id]
-                html += f"""
-                <div class="spell-item">
-                    <a href="https://www.takproject.net/allaclone/item.php?id={spell_id}" target="_blank">{spell_data['name']}</a>
-                    <span class="spell-count">x{count}</span>
-                </div>
-"""
-            html += '</div>'
-        else:
-            html += "<p><em>No PoK spells found.</em></p>"
-        
-        # Show other items (non-PoK spells) - grouped by item_id
-        if char_name in all_items:
-            other_items = [item for item in all_items[char_name] if item['item_id'] not in pok_spell_ids]
-            if other_items:
-                # Group items by item_id and count
-                item_counts = defaultdict(lambda: {'name': '', 'count': 0})
-                for item in other_items:
-                    item_id = item['item_id']
-                    item_counts[item_id]['name'] = item['item_name']
-                    item_counts[item_id]['count'] += 1
-                
-                html += f"""
-                <div class="other-items">
-                    <h4>Other Items ({len(other_items)} total, {len(item_counts)} unique)</h4>
-                    <div class="other-items-list">
-"""
-                # Sort by name, then by count
-                sorted_items = sorted(item_counts.items(), key=lambda x: (x[1]['name'], -x[1]['count']))
-                for item_id, item_data in sorted_items[:200]:  # Limit to 200 unique items
-                    count_text = f" x{item_data['count']}" if item_data['count'] > 1 else ""
-                    html += f'<div class="other-item"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2196F3; text-decoration: none;">{item_data["name"]}</a>{count_text}</div>'
-                if len(sorted_items) > 200:
-                    html += f'<div class="other-item"><em>... and {len(sorted_items) - 200} more unique items</em></div>'
-                html += "</div></div>"
-        
-        html += "</div>"
+    for char_name in [c for c in _MULE_DISPLAY_ORDER if c in char_ids]:
+        parts.append(_build_char_section((char_name, pok_spells.get(char_name, {}), inventories.get(char_name), spell_info, spell_sort_keys, pok_spell_ids)))
     
     # Officer Mules section
     if officer_inventories and officer_char_ids:
-        html += """
+        parts.append("""
         <h2>Officer Mules</h2>
-"""
-        for char_name in sorted([c for c in OFFICER_MULE_CHARACTERS if c in officer_char_ids]):
-            char_spells = officer_pok_spells[char_name]
-            has_spells = bool(char_spells)
-            section_class = "has-spells" if has_spells else "no-spells"
-            
-            html += f"""
-        <div class="character-section {section_class}">
-            <h3>{char_name}</h3>
-"""
-            if has_spells:
-                html += f"<p><strong>PoK Spells Found: {sum(char_spells.values())} total</strong></p>"
-                html += '<div class="spell-list">'
-                # Sort by class, item type, then name
-                sorted_spells = sorted(char_spells.items(), key=lambda x: get_spell_sort_key(x[0], spell_info))
-                for spell_id, count in sorted_spells:
-                    spell_data = spell_info[spell_id]
-                    html += f"""
-                <div class="spell-item">
-                    <a href="https://www.takproject.net/allaclone/item.php?id={spell_id}" target="_blank">{spell_data['name']}</a>
-                    <span class="spell-count">x{count}</span>
-                </div>
-"""
-                html += '</div>'
-            else:
-                html += "<p><em>No PoK spells found.</em></p>"
-            
-            # Show other items (non-PoK spells) - grouped by item_id
-            if char_name in officer_all_items:
-                other_items = [item for item in officer_all_items[char_name] if item['item_id'] not in pok_spell_ids]
-                if other_items:
-                    # Group items by item_id and count
-                    item_counts = defaultdict(lambda: {'name': '', 'count': 0})
-                    for item in other_items:
-                        item_id = item['item_id']
-                        item_counts[item_id]['name'] = item['item_name']
-                        item_counts[item_id]['count'] += 1
-                    
-                    html += f"""
-                <div class="other-items">
-                    <h4>Other Items ({len(other_items)} total, {len(item_counts)} unique)</h4>
-                    <div class="other-items-list">
-"""
-                    # Sort by name, then by count
-                    sorted_items = sorted(item_counts.items(), key=lambda x: (x[1]['name'], -x[1]['count']))
-                    for item_id, item_data in sorted_items[:200]:  # Limit to 200 unique items
-                        count_text = f" x{item_data['count']}" if item_data['count'] > 1 else ""
-                        html += f'<div class="other-item"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2196F3; text-decoration: none;">{item_data["name"]}</a>{count_text}</div>'
-                    if len(sorted_items) > 200:
-                        html += f'<div class="other-item"><em>... and {len(sorted_items) - 200} more unique items</em></div>'
-                    html += "</div></div>"
-            
-            html += "</div>"
-    
-    html += """
-    <script>
-    (function() {
-        var itemSearchData = """ + item_search_json + """;
-        var autocompleteNames = """ + autocomplete_names_json + """;
-        var input = document.getElementById('item-search-input');
-        var listEl = document.getElementById('autocomplete-list');
-        var resultsEl = document.getElementById('search-results');
-        var selectedIdx = -1;
+""")
+        for char_name in [c for c in _OFFICER_MULE_DISPLAY_ORDER if c in officer_char_ids]:
+            parts.append(_build_char_section((char_name, officer_pok_spells.get(char_name, {}), officer_inventories.get(char_name), spell_info, spell_sort_keys, pok_spell_ids)))
+    return ''.join(parts)
 
-        function showAutocomplete(query) {
-            query = (query || '').trim().toLowerCase();
-            if (!query) {
-                listEl.style.display = 'none';
-                listEl.innerHTML = '';
-                return;
-            }
-            var matches = autocompleteNames.filter(function(name) {
-                return name.toLowerCase().indexOf(query) !== -1;
-            }).slice(0, 80);
-            if (matches.length === 0) {
-                listEl.style.display = 'none';
-                listEl.innerHTML = '';
+def generate_html(char_ids, inventories, spell_info, officer_char_ids=None, officer_inventories=None,
+                  input_hash=None):
+    """Generate the HTML page.
+    If input_hash is set, it is written as a meta tag so main() can skip unchanged runs."""
+    
+    # Find PoK spells in inventories
+    pok_spell_ids = set(spell_info.keys())
+    # Sort key per spell, computed once and shared by every spell list sort below
+    spell_sort_keys = {sid: get_spell_sort_key(sid, spell_info) for sid in spell_info}
+    pok_spells = _scan_pok_spells(inventories, pok_spell_ids)
+    
+    # Process officer mules if provided
+    officer_pok_spells = {}
+    if officer_inventories:
+        officer_pok_spells = _scan_pok_spells(officer_inventories, pok_spell_ids)
+    
+    # Build item search index: item_id -> {name, chars: [(char_name, count), ...]}
+    # Includes all items on regular mules and officer mules (for search/autocomplete)
+    item_search_index = {}
+    for char_name, items in inventories.items():
+        for item in items:
+            item_id = item['item_id']
+            item_name = (item.get('item_name') or '').strip()
+            if not item_id:
+                continue
+            if item_id not in item_search_index:
+                item_search_index[item_id] = {'name': item_name, 'chars': defaultdict(int)}
+            item_search_index[item_id]['chars'][char_name] += 1
+    if officer_inventories:
+        for char_name, items in officer_inventories.items():
+            for item in items:
+                item_id = item['item_id']
+                item_name = (item.get('item_name') or '').strip()
+                if not item_id:
+                    continue
+                if item_id not in item_search_index:
+                    item_search_index[item_id] = {'name': item_name, 'chars': defaultdict(int)}
+                item_search_index[item_id]['chars'][char_name] += 1
+    # Convert chars to sorted list of (char_name, count) for JSON
+    item_search_list = []
+    all_item_names_for_autocomplete = []
+    for item_id, data in item_search_index.items():
+        chars_list = sorted(data['chars'].items(), key=lambda x: (-x[1], x[0]))
+        item_search_list.append({
+            'id': item_id,
+            'name': data['name'],
+            'chars': chars_list
+        })
+        if data['name']:
+            all_item_names_for_autocomplete.append(data['name'])
+    # Safe for embedding in <script>: avoid closing tag
+    def script_safe(s):
+        return s.replace("</", "<\\/")
+    item_search_json = script_safe(json.dumps(item_search_list, ensure_ascii=False))
+    autocomplete_names_json = script_safe(json.dumps(sorted(set(all_item_names_for_autocomplete)), ensure_ascii=False))
+    
+    # Create reverse mapping: spell_id -> list of characters who have it
+    spell_to_chars = {}
+    for char_name, spells in pok_spells.items():
+        for spell_id, count in spells.items():
+            spell_to_chars.setdefault(spell_id, []).append((char_name, count))
+    # Sort each holder list once so the spell cards can render it as-is
+    spell_to_chars = {sid: tuple(sorted(v)) for sid, v in spell_to_chars.items()}
+    found_set = frozenset(spell_to_chars)
+    
+    # Get magelo update date from environment variable or use default
+    magelo_update_date = os.environ.get('MAGELO_UPDATE_DATE', 'Unknown')
+    
+    parts = ["""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>TAKP Mule PoK Spell Inventory</title>
+""", f'    <meta name="input-hash" content="{input_hash}">\n' if input_hash else '', _SPELL_PAGE_CSS, """</head>
+<body>
+    <div class="container">
+        <h1>TAKP Mule PoK Spell Inventory</h1>
+        <p>Generated from magelo dump (last updated: """, magelo_update_date, """)</p>
+        <p>This page shows spells that can be obtained from PoK turn-ins (Ethereal Parchment, Spectral Parchment, Glyphed Rune Word)</p>
+        
+        <div class="search-inventory">
+            <h2>Search mule inventory</h2>
+            <p style="margin: 0 0 10px 0; color: #555; font-size: 0.95em;">Type to search items on mules. Autocomplete suggests item names; partial text matches multiple items (e.g. "ring" shows all items containing "ring").</p>
+            <div class="search-inventory-wrap">
+                <input type="text" id="item-search-input" placeholder="Item name (e.g. ring, parchment)..." autocomplete="off" />
+                <ul class="autocomplete-list" id="autocomplete-list" style="display: none;"></ul>
+            </div>
+            <div class="search-results" id="search-results"></div>
+        </div>
+"""]
+    
+    parts.append(render_summary(pok_spells))
+    parts.append("""        
+        <h2>All PoK Spells</h2>
+        <p>Spells are grouped by class and item type. Found spells are shown in green, missing spells in red. Click spell names to view on TAKProject.</p>
+""")
+    
+    # One pass over the PoK spells feeds the status grid, class nav and spell listing.
+    # Rows are (class_name, item_type, spell_id, found); class/item type are None without NPCs.
+    spell_rows = []
+    class_index = defaultdict(list)
+    for spell_id in pok_spell_ids:
+        npcs = spell_info[spell_id]['npcs']
+        found = spell_id in found_set
+        if npcs:
+            row = (npcs[0]['class'], npcs[0]['item_name'], spell_id, found)
+            class_index[row[0]].append(row)
+        else:
+            row = (None, None, spell_id, found)
+        spell_rows.append(row)
+    
+    # Get all unique classes for navigation
+    all_classes = set(class_index)
+    # Anchor slug per class, shared by the status grid, nav links and spell grid
+    anchors = {c: c.lower().replace(' ', '-') for c in all_classes}
+    
+    parts.append(render_class_status(all_classes, class_index, anchors))
+    parts.append(render_spell_grid(spell_rows, spell_info, spell_to_chars, all_classes, anchors, spell_sort_keys))
+    parts.append(render_character_sections(
+        char_ids, pok_spells, inventories, spell_info, spell_sort_keys, pok_spell_ids,
+        officer_char_ids, officer_pok_spells, officer_inventories,
+    ))
+    
+    parts.extend(("""
+    <script>
+    (function() {
+        var itemSearchData = """, item_search_json, """;
+        var autocompleteNames = """, autocomplete_names_json, """;
+        var input = document.getElementById('item-search-input');
+        var listEl = document.getElementById('autocomplete-list');
+        var resultsEl = document.getElementById('search-results');
+        var selectedIdx = -1;
+
+        function showAutocomplete(query) {
+            query = (query || '').trim().toLowerCase();
+            if (!query) {
+                listEl.style.display = 'none';
+                listEl.innerHTML = '';
+                return;
+            }
+            var matches = autocompleteNames.filter(function(name) {
+                return name.toLowerCase().indexOf(query) !== -1;
+            }).slice(0, 80);
+            if (matches.length === 0) {
+                listEl.style.display = 'none';
+                listEl.innerHTML = '';
                 return;
             }
             listEl.innerHTML = matches.map(function(name, i) {
@@ -1032,23 +1110,22 @@ def generate_html(char_ids, inventories, spell_info, officer_char_ids=None, offi
         });
     })();
     </script>
-""" + GOATCOUNTER_SCRIPT + """    </div>
+""", GOATCOUNTER_SCRIPT, """    </div>
 </body>
 </html>
-"""
+"""))
     
-    return html
+    return ''.join(parts)
 
 def compare_character_data(current_data, previous_data, character_list=None):
     """Compare current and previous character data to find deltas.
     If character_list is None, compares all characters (serverwide)."""
     deltas = {}
-    all_chars = set(list(current_data.keys()) + list(previous_data.keys()))
+    all_chars = current_data.keys() | previous_data.keys()
+    if character_list is not None:
+        all_chars &= set(character_list)
     
     for char_name in all_chars:
-        if character_list is not None and char_name not in character_list:
-            continue
-            
         current = current_data.get(char_name, {})
         previous = previous_data.get(char_name, {})
         
@@ -1073,10 +1150,28 @@ def compare_character_data(current_data, previous_data, character_list=None):
             ):
                 is_visibility_change = True
         
-        delta = {
+        is_new = char_name not in previous_data
+        level_change = current_level - previous_level if current_level < 65 and not is_deleted else 0  # Don't track level changes for 65 or deleted
+        aa_total_change = current_aa_total - previous_aa_total
+        
+        # Only include if there are changes or it's new/deleted
+        # For level 65, only show if AA changed (and level 50+)
+        # For < 65, show if level or AA changed (and level 50+ for AA)
+        has_level_change = level_change != 0
+        has_aa_change = aa_total_change != 0 and ((current_level >= 50 or previous_level >= 50) if not is_deleted else previous_level >= 50)
+        
+        # Include if HP shows 0 vs large (anon flip) so we mark is_visibility_change and exclude from HP leaderboard
+        has_hp_visibility = (previous_hp == 0 and current_hp >= VISIBILITY_CHANGE_HP_THRESHOLD) or (
+            current_hp == 0 and previous_hp >= VISIBILITY_CHANGE_HP_THRESHOLD
+        )
+        if not (has_level_change or has_aa_change or has_hp_visibility or is_new or is_deleted):
+            continue
+        
+        # Build the delta record only for characters that are kept
+        deltas[char_name] = {
             'name': char_name,
-            'level_change': current_level - previous_level if current_level < 65 and not is_deleted else 0,  # Don't track level changes for 65 or deleted
-            'aa_total_change': current_aa_total - previous_aa_total,
+            'level_change': level_change,
+            'aa_total_change': aa_total_change,
             'hp_change': current_hp - previous_hp,
             'current_level': current_level if not is_deleted else previous_level,  # Show previous level for deleted
             'previous_level': previous_level,
@@ -1086,23 +1181,10 @@ def compare_character_data(current_data, previous_data, character_list=None):
             'previous_hp': previous_hp,
             'class': current.get('class', '') or previous.get('class', ''),
             'guild': current.get('guild', '') or previous.get('guild', ''),
-            'is_new': char_name not in previous_data,
+            'is_new': is_new,
             'is_deleted': is_deleted,
             'is_visibility_change': is_visibility_change,
         }
-        
-        # Only include if there are changes or it's new/deleted
-        # For level 65, only show if AA changed (and level 50+)
-        # For < 65, show if level or AA changed (and level 50+ for AA)
-        has_level_change = delta['level_change'] != 0 and current_level < 65 and not is_deleted
-        has_aa_change = delta['aa_total_change'] != 0 and ((current_level >= 50 or previous_level >= 50) if not is_deleted else previous_level >= 50)
-        
-        # Include if HP shows 0 vs large (anon flip) so we mark is_visibility_change and exclude from HP leaderboard
-        has_hp_visibility = (previous_hp == 0 and current_hp >= VISIBILITY_CHANGE_HP_THRESHOLD) or (
-            current_hp == 0 and previous_hp >= VISIBILITY_CHANGE_HP_THRESHOLD
-        )
-        if has_level_change or has_aa_change or has_hp_visibility or delta['is_new'] or delta['is_deleted']:
-            deltas[char_name] = delta
     
     return deltas
 
@@ -1169,7 +1251,8 @@ def chars_corpse_loot_excluded(current_inv, previous_inv):
 
 
 def load_no_rent_items():
-    """Load list of no-rent item IDs from JSON file."""
+    """Load list of no-rent item IDs from JSON file.
+    Each id is stored as both int and str so inventory rows (string item_id) match without conversion."""
     base_dir = os.path.dirname(__file__)
     no_rent_file = os.path.join(base_dir, "no_rent_items.json")
     
@@ -1177,7 +1260,14 @@ def load_no_rent_items():
         try:
             with open(no_rent_file, 'r') as f:
                 item_ids = json.load(f)
-                return set(item_ids)  # Convert to set for fast lookup
+            no_rent = set()
+            for item_id in item_ids:
+                no_rent.add(sys.intern(str(item_id)))
+                try:
+                    no_rent.add(int(item_id))
+                except (ValueError, TypeError):
+                    pass
+            return no_rent
         except Exception as e:
             print(f"Warning: Could not load no_rent_items.json: {e}")
             return set()
@@ -1186,9 +1276,11 @@ def load_no_rent_items():
         return set()
 
 
+@lru_cache(maxsize=1)
 def load_no_drop_tracked_item_ids():
     """Load set of tracked item IDs that are NO DROP (from data/item_stats.json flags).
-    Used to only count mob kills from non-no-drop loot when serverwide net change is positive."""
+    Used to only count mob kills from non-no-drop loot when serverwide net change is positive.
+    Cached for the process; callers must not mutate the returned set."""
     base_dir = os.path.dirname(__file__)
     no_drop = set()
     for path in [os.path.join(base_dir, 'data', 'item_stats.json'), 'data/item_stats.json']:
@@ -1202,7 +1294,7 @@ def load_no_drop_tracked_item_ids():
                 if isinstance(flags, str):
                     flags = [f.strip() for f in flags.split('|')]
                 if 'NO DROP' in flags:
-                    no_drop.add(str(item_id_str))
+                    no_drop.add(sys.intern(str(item_id_str)))
             return no_drop
         except Exception as e:
             print(f"Warning: Could not load item_stats for no_drop: {e}")
@@ -1210,10 +1302,13 @@ def load_no_drop_tracked_item_ids():
     return set()
 
 
+@lru_cache(maxsize=1)
 def load_tracked_item_ids():
     """Load raid, elemental armor, and praesterium item IDs from the 3 JSON files.
     Returns (set of item_id strings, dict item_id -> source_label for display, dict item_id -> zone for raid items, dict item_id -> mob name).
-    Raid items use mob name from JSON (e.g. 'Mob Name (Zone)'); others use category label."""
+    Raid items use mob name from JSON (e.g. 'Mob Name (Zone)'); others use category label.
+    Ids are interned like the inventory item_ids they are matched against.
+    Cached for the process (the source files don't change during a run); callers must not mutate the results."""
     base_dir = os.path.dirname(__file__)
     tracked = set()
     source_label = {}
@@ -1226,7 +1321,7 @@ def load_tracked_item_ids():
             with open(raid_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             for item_id, entry in data.items():
-                sid = str(item_id)
+                sid = sys.intern(str(item_id))
                 tracked.add(sid)
                 mob = entry.get("mob", "").strip()
                 zone = entry.get("zone", "").strip()
@@ -1252,7 +1347,7 @@ def load_tracked_item_ids():
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             for item_id in data:
-                sid = str(item_id)
+                sid = sys.intern(str(item_id))
                 tracked.add(sid)
                 source_label[sid] = label
                 if zone_name:
@@ -1289,6 +1384,19 @@ def apply_visibility_change_to_char_deltas(char_deltas):
             delta['is_visibility_change'] = True
 
 
+_ITEM_ID = itemgetter('item_id')
+
+
+def _count_rentable_items(items, no_rent_items):
+    """Count inventory rows per item_id, excluding no-rent ids.
+    Counting runs entirely in C (Counter over map(itemgetter)); no-rent ids are then dropped
+    from the distinct keys, which is far fewer operations than testing every row."""
+    counts = Counter(map(_ITEM_ID, items))
+    for item_id in counts.keys() & no_rent_items:
+        del counts[item_id]
+    return counts
+
+
 def compare_inventories(current_inv, previous_inv, character_list=None):
     """Compare current and previous inventories to find item deltas.
     If character_list is None, compares all characters (serverwide).
@@ -1297,61 +1405,24 @@ def compare_inventories(current_inv, previous_inv, character_list=None):
     item_deltas = {}
     
     # Load no-rent items to filter out
-    no_rent_items = load_no_rent_items()
+    no_rent_items = frozenset(load_no_rent_items())
     if no_rent_items:
-        print(f"Filtering out {len(no_rent_items)} no-rent items from delta comparison")
+        print(f"Filtering out {len({str(i) for i in no_rent_items})} no-rent items from delta comparison")
     
     # Get all characters from both inventories
-    all_chars = set(list(current_inv.keys()) + list(previous_inv.keys()))
+    all_chars = current_inv.keys() | previous_inv.keys()
     if character_list is not None:
-        all_chars = all_chars.intersection(set(character_list))
+        all_chars &= set(character_list)
     
     for char_name in all_chars:
         if char_name not in current_inv and char_name not in previous_inv:
             continue
             
-        current_items = defaultdict(int)
-        previous_items = defaultdict(int)
-        
-        # Count items in current inventory (excluding no-rent)
-        if char_name in current_inv:
-            for item in current_inv[char_name]:
-                item_id = item['item_id']
-                # Convert to int for comparison with no-rent items set
-                try:
-                    item_id_int = int(item_id)
-                    if item_id_int not in no_rent_items:  # Filter out no-rent items
-                        current_items[item_id] += 1
-                except (ValueError, TypeError):
-                    # If item_id can't be converted, include it (shouldn't happen)
-                    current_items[item_id] += 1
-        
-        # Count items in previous inventory (excluding no-rent)
-        if char_name in previous_inv:
-            for item in previous_inv[char_name]:
-                item_id = item['item_id']
-                # Convert to int for comparison with no-rent items set
-                try:
-                    item_id_int = int(item_id)
-                    if item_id_int not in no_rent_items:  # Filter out no-rent items
-                        previous_items[item_id] += 1
-                except (ValueError, TypeError):
-                    # If item_id can't be converted, include it (shouldn't happen)
-                    previous_items[item_id] += 1
-        
-        # Find added and removed items
-        added_items = {}
-        removed_items = {}
-        
-        for item_id, count in current_items.items():
-            prev_count = previous_items.get(item_id, 0)
-            if count > prev_count:
-                added_items[item_id] = count - prev_count
-        
-        for item_id, count in previous_items.items():
-            curr_count = current_items.get(item_id, 0)
-            if count > curr_count:
-                removed_items[item_id] = count - curr_count
+        # Count items per snapshot (excluding no-rent); Counter subtraction keeps only positive deltas
+        current_items = _count_rentable_items(current_inv.get(char_name, ()), no_rent_items)
+        previous_items = _count_rentable_items(previous_inv.get(char_name, ()), no_rent_items)
+        added_items = dict(current_items - previous_items)
+        removed_items = dict(previous_items - current_items)
         
         if added_items or removed_items:
             in_current = char_name in current_inv
@@ -1362,7 +1433,6 @@ def compare_inventories(current_inv, previous_inv, character_list=None):
             item_deltas[char_name] = {
                 'added': added_items,
                 'removed': removed_items,
-                'item_names': {},  # Will be populated with item names
                 'is_visibility_change': is_visibility_change,
             }
     
@@ -1711,177 +1781,8 @@ def save_mob_deaths_from_delta(zone_entries, output_path, observed_at=None, max_
         json.dump(data, f, indent=2)
 
 
-def generate_delta_html(current_char_data, previous_char_data, current_inv, previous_inv, 
-                        magelo_update_date, serverwide=True, char_deltas=None, inv_deltas=None,
-                        mob_tracker_deaths_path=None, observed_at=None, raid_item_sources_path=None,
-                        corpse_loot_chars=None):
-    """Generate HTML page showing deltas between current and previous magelo dump.
-    If serverwide is True, compares all characters, otherwise only mules.
-    If char_deltas and inv_deltas are provided, uses those instead of recalculating.
-    If mob_tracker_deaths_path and observed_at are set, appends (zone, mob) from this delta to the mob tracker JSON.
-    If raid_item_sources_path is set, used to drop deaths 1 day after repop window ends.
-    If corpse_loot_chars is set, use it instead of inferring from current_inv vs previous_inv."""
-    
-    # Compare character data (serverwide) if not provided
-    if char_deltas is None:
-        char_deltas = compare_character_data(current_char_data, previous_char_data, None if serverwide else None)
-    
-    # Compare inventories (serverwide) if not provided
-    if inv_deltas is None:
-        inv_deltas = compare_inventories(current_inv, previous_inv, None if serverwide else None)
-    
-    # Get item names for inventory deltas
-    all_item_ids = set()
-    for char_delta in inv_deltas.values():
-        all_item_ids.update(char_delta['added'].keys())
-        all_item_ids.update(char_delta['removed'].keys())
-    
-    # Try to get item names from current inventory
-    item_names = {}
-    for char_name, items in current_inv.items():
-        for item in items:
-            if item['item_id'] in all_item_ids:
-                item_names[item['item_id']] = item['item_name']
-    
-    # Populate item names in deltas
-    for char_delta in inv_deltas.values():
-        for item_id in char_delta['added']:
-            if item_id in item_names:
-                char_delta['item_names'][item_id] = item_names[item_id]
-        for item_id in char_delta['removed']:
-            if item_id in item_names:
-                char_delta['item_names'][item_id] = item_names[item_id]
-    
-    # Load tracked item IDs (raid / elemental armor / praesterium) and filter deltas for that set
-    tracked_ids, tracked_source_label, item_zone, item_mob = load_tracked_item_ids()
-    tracked_deltas = {}
-    if tracked_ids:
-        for char_name, delta in inv_deltas.items():
-            added = {k: v for k, v in delta['added'].items() if str(k) in tracked_ids}
-            removed = {k: v for k, v in delta['removed'].items() if str(k) in tracked_ids}
-            if added or removed:
-                tracked_deltas[char_name] = {
-                    'added': added,
-                    'removed': removed,
-                    'item_names': {k: v for k, v in delta['item_names'].items() if str(k) in tracked_ids},
-                    'is_visibility_change': delta.get('is_visibility_change', False),
-                }
-    
-    # Characters who went 0 equipped -> any equipped (corpse loot across day boundary): exclude from delta/raid/mob tracker
-    if corpse_loot_chars is None:
-        corpse_loot_chars = chars_corpse_loot_excluded(current_inv, previous_inv)
-    # Tracked item IDs that are NO DROP (from item_stats); non-no-drop tracked loot needs net-change verification for mob kill
-    no_drop_tracked = load_no_drop_tracked_item_ids() & tracked_ids if tracked_ids else set()
-    # Serverwide net change per tracked item (excluding corpse-loot chars) for non-no-drop kill verification
-    net_change_tracked = defaultdict(int)
-    for char_name, delta in tracked_deltas.items():
-        if char_name in corpse_loot_chars:
-            continue
-        for item_id, c in (delta.get('added') or {}).items():
-            net_change_tracked[item_id] += c
-        for item_id, c in (delta.get('removed') or {}).items():
-            net_change_tracked[item_id] -= c
-    
-    # Items by zone: only chars in BOTH snapshots (exclude visibility-change and corpse-loot); only raid zones
-    # For non-no-drop tracked loot, only add (zone, mob) when serverwide net change for that item is positive
-    # Structure: zone_entries[zone][mob] = [(char_name, item_id, item_name), ...]
-    chars_in_both = set(current_inv.keys()) & set(previous_inv.keys())
-    zone_entries = {}
-    for char_name in tracked_deltas:
-        if char_name not in chars_in_both or tracked_deltas[char_name].get('is_visibility_change') or char_name in corpse_loot_chars:
-            continue
-        delta = tracked_deltas[char_name]
-        for item_id, count in (delta.get('added') or {}).items():
-            # Non-no-drop tracked loot: only count toward mob kill if serverwide net change is positive
-            if str(item_id) not in no_drop_tracked and net_change_tracked.get(item_id, 0) <= 0:
-                continue
-            zone = item_zone.get(str(item_id))
-            if not zone:
-                continue
-            mob = item_mob.get(str(item_id), "")
-            item_name = (delta.get('item_names') or {}).get(item_id, f"Item {item_id}")
-            if zone not in zone_entries:
-                zone_entries[zone] = {}
-            if mob not in zone_entries[zone]:
-                zone_entries[zone][mob] = []
-            for _ in range(count):
-                zone_entries[zone][mob].append((char_name, item_id, item_name))
-    
-    if zone_entries and mob_tracker_deaths_path and observed_at is not None:
-        save_mob_deaths_from_delta(zone_entries, mob_tracker_deaths_path, observed_at=observed_at,
-                                   raid_item_sources_path=raid_item_sources_path)
-    
-    # Leaderboards: only consider characters present in BOTH snapshots (explicit presence), minus corpse-loot
-    chars_in_both = set(current_char_data.keys()) & set(previous_char_data.keys())
-    chars_eligible_leaderboard = chars_in_both - corpse_loot_chars
-    
-    # For display: still compute visibility-change set (anon ↔ not-anon) for character table and visibility note
-    visibility_change_chars = {name for name, inv_d in inv_deltas.items() if inv_d.get('is_visibility_change')}
-    for name, char_d in char_deltas.items():
-        if char_d.get('is_visibility_change'):
-            visibility_change_chars.add(name)
-    visibility_change_chars |= corpse_loot_chars
-    
-    # Calculate AA leaderboard (top gainers); only chars present in both snapshots, exclude new/deleted, visibility-change, and corpse-loot
-    aa_leaderboard = []
-    for char_name, delta in char_deltas.items():
-        if char_name not in chars_eligible_leaderboard:
-            continue
-        if delta.get('is_deleted', False) or delta.get('is_new', False):
-            continue
-        if delta.get('is_visibility_change', False):
-            continue
-        current_level = delta['current_level']
-        previous_level = delta['previous_level']
-        aa_gain = delta['aa_total_change']
-        
-        # Only include if level 50+ and gained AA
-        if (current_level >= 50 or previous_level >= 50) and aa_gain > 0:
-            aa_leaderboard.append({
-                'name': char_name,
-                'class': delta['class'],
-                'level': current_level,
-                'aa_gain': aa_gain,
-                'aa_total': delta['current_aa_total']
-            })
-    
-    # Sort by AA gain (descending) and take top 20
-    aa_leaderboard.sort(key=lambda x: x['aa_gain'], reverse=True)
-    aa_leaderboard = aa_leaderboard[:20]
-    
-    # Calculate HP leaderboard (top gainers); only chars present in both snapshots, exclude new/deleted, visibility-change
-    hp_leaderboard = []
-    for char_name, delta in char_deltas.items():
-        if char_name not in chars_eligible_leaderboard:
-            continue
-        if delta.get('is_deleted', False) or delta.get('is_new', False):
-            continue
-        if delta.get('is_visibility_change', False):
-            continue
-        current_level = delta['current_level']
-        hp_gain = delta['hp_change']
-        
-        # Only include if gained HP (any level)
-        if hp_gain > 0:
-            hp_leaderboard.append({
-                'name': char_name,
-                'class': delta['class'],
-                'level': current_level,
-                'hp_gain': hp_gain,
-                'hp_total': delta['current_hp']
-            })
-    
-    # Sort by HP gain (descending) and take top 20
-    hp_leaderboard.sort(key=lambda x: x['hp_gain'], reverse=True)
-    hp_leaderboard = hp_leaderboard[:20]
-    
-    html = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TAKP Mule Delta Report</title>
-    <style>
+# Static pieces of the delta report page (generate_delta_html)
+_DELTA_PAGE_CSS = """    <style>
         body {
             font-family: Arial, sans-serif;
             margin: 20px;
@@ -1941,6 +1842,14 @@ def generate_delta_html(current_char_data, previous_char_data, current_inv, prev
             border-radius: 3px;
             font-size: 0.9em;
         }
+        .item-badge a {
+            color: inherit;
+            text-decoration: none;
+        }
+        .item-source {
+            color: #888;
+            font-size: 0.85em;
+        }
         .item-added {
             background-color: #e8f5e9;
             color: #2e7d32;
@@ -2037,240 +1946,265 @@ def generate_delta_html(current_char_data, previous_char_data, current_inv, prev
             background-color: #e0485a;
         }
     </style>
-</head>
+"""
+
+_DELTA_HTML_HEADER = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>TAKP Mule Delta Report</title>
+{css}</head>
 <body>
     <div class="container">
         <h1>TAKP Mule Delta Report</h1>
-        <p>Changes detected since previous magelo dump (last updated: """ + magelo_update_date + """)</p>
+        <p>Changes detected since previous magelo dump (last updated: {date})</p>
         
         <div class="nav-menu">
             <h3>Jump to Section:</h3>
             <div class="nav-links">
 """
-    
-    # Split inventory deltas by level 1 (mules/traders) vs others; exclude corpse-loot chars from display
-    inv_deltas_level1 = {}
-    inv_deltas_others = {}
-    for char_name, delta in inv_deltas.items():
-        if char_name in corpse_loot_chars:
-            continue
-        # Check if character is level 1 in current data
-        char_level = current_char_data.get(char_name, {}).get('level', 0)
-        if char_level == 1:
-            inv_deltas_level1[char_name] = delta
-        else:
-            inv_deltas_others[char_name] = delta
-    
-    # Calculate week and month for leaderboard links
-    week_start = None
-    month_start = None
-    try:
-        if magelo_update_date != 'Unknown':
-            from datetime import datetime
-            try:
-                dt = datetime.strptime(magelo_update_date, '%a %b %d %H:%M:%S UTC %Y')
-                date_str = dt.strftime('%Y-%m-%d')
-            except:
-                date_str = datetime.now().strftime('%Y-%m-%d')
+
+_AA_LEADERBOARD_HEAD = """
+        <div class="leaderboard" id="aa-leaderboard">
+            <h2>🏆 Top AA Gainers</h2>
+            <table class="leaderboard-table">
+                <thead>
+                    <tr>
+                        <th>Rank</th>
+                        <th>Character</th>
+                        <th>Class</th>
+                        <th>Level</th>
+                        <th>AA Gained</th>
+                        <th>Total AA</th>
+                    </tr>
+                </thead>
+                <tbody>
+"""
+
+_HP_LEADERBOARD_HEAD = """
+        <div class="leaderboard" id="hp-leaderboard" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
+            <h2>❤️ Top HP Gainers</h2>
+            <table class="leaderboard-table">
+                <thead>
+                    <tr>
+                        <th>Rank</th>
+                        <th>Character</th>
+                        <th>Class</th>
+                        <th>Level</th>
+                        <th>HP Gained</th>
+                        <th>Total HP</th>
+                    </tr>
+                </thead>
+                <tbody>
+"""
+
+_CHAR_TABLE_HEAD = """
+        <h2 id="character-changes">Character Level & AA Changes</h2>
+        <table class="delta-table">
+            <thead>
+                <tr>
+                    <th>Character</th>
+                    <th>Class</th>
+                    <th>Level</th>
+                    <th>Level Change</th>
+                    <th>Total AA</th>
+                    <th>AA Total Change</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+
+# Link prefixes for item and character pages
+_ITEM_URL_PREFIX = 'https://www.takproject.net/allaclone/item.php?id='
+_MAGELO_URL_PREFIX = 'https://www.takproject.net/magelo/character.php?char='
+
+# Rank badge for each leaderboard position (index = 1-based rank; leaderboards hold at most 20 entries)
+_RANK_BADGES = tuple(
+    f'<span class="rank-badge {("rank-1", "rank-2", "rank-3")[idx - 1] if 1 <= idx <= 3 else "rank-other"}">{idx}</span>'
+    for idx in range(21)
+)
+
+# CSS class for a negative / zero / positive change, indexed by sign + 1
+_SIGN_CLASSES = ('negative', 'neutral', 'positive')
+
+_DELTA_HTML_FOOTER = """
+    </div>
+""" + GOATCOUNTER_SCRIPT + """
+</body>
+</html>
+"""
+
+
+def _emit_badges(parts, items, item_names, css_cls, source_labels=None):
+    """Append one item badge per (item_id, count) in items, ordered by item_id.
+    item_names holds already-escaped names (escaped once per page, not once per badge).
+    Link color and the source label style come from the page CSS (.item-badge a, .item-source), not per-badge styles.
+    With source_labels (tracked items), each badge also carries its "(source)" label span."""
+    append = parts.append
+    # Ids are unique keys, so sorting the keys alone gives the same order as sorting (id, count) pairs
+    for item_id in sorted(items):
+        count = items[item_id]
+        name = item_names.get(item_id, f"Item {item_id}")
+        if source_labels is None:
+            append(f'<span class="item-badge {css_cls}"><a href="{_ITEM_URL_PREFIX}{item_id}" target="_blank">{name}</a>{f" x{count}" if count > 1 else ""}</span>')
         else:
-            from datetime import datetime
-            date_str = datetime.now().strftime('%Y-%m-%d')
-        
-        week_start = get_week_start(date_str)
-        month_start = get_month_start(date_str)
-    except Exception as e:
-        print(f"Warning: Could not calculate week/month for leaderboard links: {e}")
-    
-    # Build navigation links based on what sections will be shown (Items by Zone first)
-    nav_links = []
-    if zone_entries:
-        nav_links.append('<a href="#items-by-zone">📍 Items by Zone</a>')
-    if aa_leaderboard:
-        nav_links.append('<a href="#aa-leaderboard">🏆 AA Leaderboard</a>')
-    if hp_leaderboard:
-        nav_links.append('<a href="#hp-leaderboard" class="hp-link">❤️ HP Leaderboard</a>')
-    if char_deltas:
-        nav_links.append('<a href="#character-changes">Character Changes</a>')
-    if inv_deltas_level1:
-        nav_links.append('<a href="#inventory-changes-level1">Level 1 (Mules/Traders)</a>')
-    if inv_deltas_others:
-        nav_links.append('<a href="#inventory-changes">Inventory Changes</a>')
-    if tracked_deltas:
-        nav_links.append('<a href="#tracked-items" style="background-color: #FF9800;">📌 Tracked Items</a>')
-    
-    # Add weekly/monthly leaderboard links
-    if week_start:
-        nav_links.append(f'<a href="leaderboard_week_{week_start}.html" style="background-color: #2196F3;">📅 Weekly Leaderboard</a>')
-    if month_start:
-        nav_links.append(f'<a href="leaderboard_month_{month_start}.html" style="background-color: #9C27B0;">📆 Monthly Leaderboard</a>')
-    # Add delta history link (for date range queries)
-    nav_links.append('<a href="delta-history.html" style="background-color: #607D8B;">📜 Delta History</a>')
-    # Raid mob repop tracker (deaths + repop windows)
-    nav_links.append('<a href="mob_tracker.html" style="background-color: #795548;">⏱ Raid Mob Repop Tracker</a>')
-    
-    html += "".join(nav_links)
-    html += """
+            source = source_labels.get(item_id)
+            append(f'<span class="item-badge {css_cls}"><a href="{_ITEM_URL_PREFIX}{item_id}" target="_blank">{name}</a>{f" x{count}" if count > 1 else ""}<span class="item-source">{f" ({esc(source)})" if source else ""}</span></span>')
+
+
+# Opening/closing markup of one "Items Added" / "Items Removed" list inside a character block
+_DELTA_SIDE_OPEN = """
+            <div style="margin: 10px 0;">
+                <strong style="color: {color};">{label}</strong>
+                <div class="item-list" style="margin-top: 5px;">
+"""
+_DELTA_SIDE_CLOSE = """
+                </div>
             </div>
-        </div>
 """
-    
+
+
+def _render_delta_block(parts, heading, delta, item_names, *, bg_color=None,
+                        labels=('Items Added:', 'Items Removed:'), source_labels=None):
+    """Append one character's inventory delta block: heading plus added and removed badge lists.
+    heading is trusted HTML for the <h3>; item_names are pre-escaped; source_labels is passed through for tracked-item badges."""
+    bg = f" background-color: {bg_color};" if bg_color else ""
+    parts.append(f"""
+        <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px;{bg}">
+            <h3>{heading}</h3>
+""")
+    if delta['added']:
+        parts.append(_DELTA_SIDE_OPEN.format(color='#4CAF50', label=labels[0]))
+        _emit_badges(parts, delta['added'], item_names, 'item-added', source_labels)
+        parts.append(_DELTA_SIDE_CLOSE)
+    if delta['removed']:
+        parts.append(_DELTA_SIDE_OPEN.format(color='#f44336', label=labels[1]))
+        _emit_badges(parts, delta['removed'], item_names, 'item-removed', source_labels)
+        parts.append(_DELTA_SIDE_CLOSE)
+    parts.append("""
+        </div>
+""")
+
+
+def _render_zone_items(parts, zone_entries, current_char_data):
+    """Append the "Items by Zone" section: tracked loot grouped by zone, then by mob."""
     # Items by zone (at top; raid + elemental + praesterium)
     if zone_entries:
-        html += """
+        parts.append("""
         <h2 id="items-by-zone">📍 Items by Zone</h2>
         <p><em>Tracked loot (raid, elemental, praesterium) acquired this period, grouped by zone. Only characters present in both snapshots.</em></p>
-"""
+""")
         for zone in sorted(zone_entries.keys()):
             mobs = zone_entries[zone]
-            html += f"""
+            parts.append(f"""
         <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #f5f5f5;">
-            <h3 style="margin-top: 0;">{zone}</h3>
-"""
+            <h3 style="margin-top: 0;">{esc(zone)}</h3>
+""")
             # Sort mobs: named mobs first (alphabetically), then "" (no mob) last
             for mob in sorted(mobs.keys(), key=lambda m: (m == "", m)):
                 entries = mobs[mob]
                 if mob:
-                    html += f'            <h4 style="margin: 12px 0 6px 0; font-size: 1em; color: #555;">{mob}</h4>\n'
-                html += """
+                    parts.append(f'            <h4 style="margin: 12px 0 6px 0; font-size: 1em; color: #555;">{esc(mob)}</h4>\n')
+                parts.append("""
             <ul style="margin: 0; padding-left: 20px;">
-"""
+""")
                 for char_name, item_id, item_name in entries:
                     guild = (current_char_data.get(char_name, {}) or {}).get('guild', '')
-                    char_display = f"{char_name} &lt;{guild}&gt;" if guild else char_name
+                    char_display = f"{esc(char_name)} &lt;{esc(guild)}&gt;" if guild else esc(char_name)
                     char_slug = char_name.lower().replace(' ', '_')
-                    item_url = f"https://www.takproject.net/allaclone/item.php?id={item_id}"
-                    magelo_url = f"https://www.takproject.net/magelo/character.php?char={char_slug}"
-                    html += f'                <li><a href="{magelo_url}" target="_blank" style="text-decoration: none; font-weight: bold;">{char_display}</a> — <a href="{item_url}" target="_blank" style="color: #2e7d32;">{item_name}</a></li>\n'
-                html += """
+                    item_url = _ITEM_URL_PREFIX + item_id
+                    magelo_url = _MAGELO_URL_PREFIX + char_slug
+                    parts.append(f'                <li><a href="{magelo_url}" target="_blank" style="text-decoration: none; font-weight: bold;">{char_display}</a> — <a href="{item_url}" target="_blank" style="color: #2e7d32;">{esc(item_name)}</a></li>\n')
+                parts.append("""
             </ul>
-"""
-            html += """
+""")
+            parts.append("""
         </div>
-"""
-    
+""")
+
+
+def _render_delta_leaderboards(parts, aa_leaderboard, hp_leaderboard):
+    """Append the AA and HP gain leaderboard tables (each only if it has entries)."""
     # AA Leaderboard
     if aa_leaderboard:
-        html += """
-        <div class="leaderboard" id="aa-leaderboard">
-            <h2>🏆 Top AA Gainers</h2>
-            <table class="leaderboard-table">
-                <thead>
-                    <tr>
-                        <th>Rank</th>
-                        <th>Character</th>
-                        <th>Class</th>
-                        <th>Level</th>
-                        <th>AA Gained</th>
-                        <th>Total AA</th>
-                    </tr>
-                </thead>
-                <tbody>
-"""
+        parts.append(_AA_LEADERBOARD_HEAD)
         for idx, entry in enumerate(aa_leaderboard, 1):
-            rank_class = "rank-1" if idx == 1 else "rank-2" if idx == 2 else "rank-3" if idx == 3 else "rank-other"
-            html += f"""
+            parts.append(f"""
                     <tr>
-                        <td><span class="rank-badge {rank_class}">{idx}</span></td>
-                        <td><strong>{entry['name']}</strong></td>
-                        <td>{entry['class']}</td>
+                        <td>{_RANK_BADGES[idx]}</td>
+                        <td><strong>{esc(entry['name'])}</strong></td>
+                        <td>{esc(entry['class'])}</td>
                         <td>{entry['level']}</td>
                         <td style="color: #4CAF50; font-weight: bold;">+{entry['aa_gain']}</td>
                         <td>{entry['aa_total']}</td>
                     </tr>
-"""
-        html += """
+""")
+        parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
     
     # HP Leaderboard
     if hp_leaderboard:
-        html += """
-        <div class="leaderboard" id="hp-leaderboard" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
-            <h2>❤️ Top HP Gainers</h2>
-            <table class="leaderboard-table">
-                <thead>
-                    <tr>
-                        <th>Rank</th>
-                        <th>Character</th>
-                        <th>Class</th>
-                        <th>Level</th>
-                        <th>HP Gained</th>
-                        <th>Total HP</th>
-                    </tr>
-                </thead>
-                <tbody>
-"""
+        parts.append(_HP_LEADERBOARD_HEAD)
         for idx, entry in enumerate(hp_leaderboard, 1):
-            rank_class = "rank-1" if idx == 1 else "rank-2" if idx == 2 else "rank-3" if idx == 3 else "rank-other"
-            html += f"""
+            parts.append(f"""
                     <tr>
-                        <td><span class="rank-badge {rank_class}">{idx}</span></td>
-                        <td><strong>{entry['name']}</strong></td>
-                        <td>{entry['class']}</td>
+                        <td>{_RANK_BADGES[idx]}</td>
+                        <td><strong>{esc(entry['name'])}</strong></td>
+                        <td>{esc(entry['class'])}</td>
                         <td>{entry['level']}</td>
                         <td style="color: #fff; font-weight: bold;">+{entry['hp_gain']}</td>
                         <td>{entry['hp_total']}</td>
                     </tr>
-"""
-        html += """
+""")
+        parts.append("""
                 </tbody>
             </table>
         </div>
-"""
-    
-    html += """
-"""
-    
+""")
+
+
+def _render_character_changes(parts, char_deltas, visibility_change_chars):
+    """Append the character level & AA changes table; visibility-change characters are skipped."""
     # Character level and AA changes
     if char_deltas:
-        html += """
-        <h2 id="character-changes">Character Level & AA Changes</h2>
-        <table class="delta-table">
-            <thead>
-                <tr>
-                    <th>Character</th>
-                    <th>Class</th>
-                    <th>Level</th>
-                    <th>Level Change</th>
-                    <th>Total AA</th>
-                    <th>AA Total Change</th>
-                </tr>
-            </thead>
-            <tbody>
-"""
+        parts.append(_CHAR_TABLE_HEAD)
         # Sort all deltas (skip inv-flagged visibility-change chars; they appear in the visibility note only)
-        for char_name in sorted(char_deltas.keys()):
-            delta = char_deltas[char_name]
+        for char_name, delta in sorted(char_deltas.items()):
             if char_name in visibility_change_chars:
                 continue
             current_level = delta['current_level']
+            previous_level = delta['previous_level']
             is_deleted = delta.get('is_deleted', False)
+            tracks_aa = current_level >= 50 or previous_level >= 50
             
             # Character name display - mark deleted characters
             if is_deleted:
-                char_display = f'<strong style="color: #999; text-decoration: line-through;">{char_name}</strong> <span style="color: #f44336; font-size: 0.9em;">(Deleted)</span>'
+                char_display = f'<strong style="color: #999; text-decoration: line-through;">{esc(char_name)}</strong> <span style="color: #f44336; font-size: 0.9em;">(Deleted)</span>'
             else:
-                char_display = f'<strong>{char_name}</strong>'
+                char_display = f'<strong>{esc(char_name)}</strong>'
             
             # Level change display (only hide if they were already 65 in previous dump)
             # Characters leveling 50-65 should show level changes
             if is_deleted:
-                level_display = f'<span class="negative">Deleted (was {delta["previous_level"]})</span>'
-            elif delta['previous_level'] == 65:
+                level_display = f'<span class="negative">Deleted (was {previous_level})</span>'
+            elif previous_level == 65:
                 # Was already 65, can't level anymore
                 level_display = '<span class="neutral">—</span>'  # No level tracking for already-65
             else:
                 # Show level changes for characters leveling (including those who just reached 65)
-                level_class = "positive" if delta['level_change'] > 0 else "negative" if delta['level_change'] < 0 else "neutral"
-                level_text = f"+{delta['level_change']}" if delta['level_change'] > 0 else str(delta['level_change'])
-                level_display = f'<span class="{level_class}">{level_text} ({delta["previous_level"]} → {delta["current_level"]})</span>'
+                level_change = delta['level_change']
+                level_class = _SIGN_CLASSES[(level_change > 0) - (level_change < 0) + 1]
+                level_text = f"+{level_change}" if level_change > 0 else str(level_change)
+                level_display = f'<span class="{level_class}">{level_text} ({previous_level} → {current_level})</span>'
             
             # Total AA display
             if is_deleted:
                 total_aa_display = f'<span style="color: #999;">{delta["previous_aa_total"]}</span>'
-            elif current_level >= 50 or delta['previous_level'] >= 50:
+            elif tracks_aa:
                 total_aa_display = str(delta['current_aa_total'])
             else:
                 total_aa_display = '<span class="neutral">—</span>'  # No AA tracking for < 50
@@ -2279,37 +2213,40 @@ def generate_delta_html(current_char_data, previous_char_data, current_inv, prev
             if is_deleted:
                 # For deleted, show AA loss
                 aa_total_change = delta['aa_total_change']
-                aa_class = "negative"
-                aa_text = f"{aa_total_change}" if aa_total_change < 0 else f"-{delta['previous_aa_total']}"
-                aa_display = f'<span class="{aa_class}">{aa_text} (was {delta["previous_aa_total"]})</span>'
-            elif current_level >= 50 or delta['previous_level'] >= 50:
+                previous_aa_total = delta['previous_aa_total']
+                aa_text = f"{aa_total_change}" if aa_total_change < 0 else f"-{previous_aa_total}"
+                aa_display = f'<span class="negative">{aa_text} (was {previous_aa_total})</span>'
+            elif tracks_aa:
                 aa_total_change = delta['aa_total_change']
-                aa_class = "positive" if aa_total_change > 0 else "negative" if aa_total_change < 0 else "neutral"
+                aa_class = _SIGN_CLASSES[(aa_total_change > 0) - (aa_total_change < 0) + 1]
                 aa_text = f"+{aa_total_change}" if aa_total_change > 0 else str(aa_total_change)
                 aa_display = f'<span class="{aa_class}">{aa_text}</span>'
             else:
                 aa_display = '<span class="neutral">—</span>'  # No AA tracking for < 50
             
-            html += f"""
+            parts.append(f"""
                 <tr>
                     <td>{char_display}</td>
-                    <td>{delta['class']}</td>
-                    <td>{delta['previous_level'] if is_deleted else delta['current_level']}</td>
+                    <td>{esc(delta['class'])}</td>
+                    <td>{previous_level if is_deleted else current_level}</td>
                     <td>{level_display}</td>
                     <td>{total_aa_display}</td>
                     <td>{aa_display}</td>
                 </tr>
-"""
-        html += """
+""")
+        parts.append("""
             </tbody>
         </table>
-"""
+""")
     else:
-        html += """
+        parts.append("""
         <h2>Character Level & AA Changes</h2>
         <p class="no-changes">No level or AA changes detected.</p>
-"""
-    
+""")
+
+
+def _render_visibility_note(parts, visibility_change_chars, inv_deltas_level1, inv_deltas_others, tracked_deltas):
+    """Append the single collapsible note listing anon/not-anon visibility-change characters."""
     # Single visibility note (show once; sections below show only actual changes)
     all_vis = set(visibility_change_chars)
     if inv_deltas_level1:
@@ -2326,232 +2263,357 @@ def generate_delta_html(current_char_data, previous_char_data, current_inv, prev
                 all_vis.add(c)
     if all_vis:
         all_vis_sorted = sorted(all_vis)
-        html += f"""
+        parts.append(f"""
         <details id="visibility-note" style="color: #757575; margin: 15px 0; padding: 10px; background: #fafafa; border-radius: 5px; border-left: 4px solid #9e9e9e;">
             <summary style="cursor: pointer; font-style: italic;"><strong>Visibility change (anon ↔ not anon)</strong> — {len(all_vis_sorted)} character(s); their inventory and tracked item deltas are not listed below. Click to expand names.</summary>
-            <p style="margin: 8px 0 0 0; font-size: 0.9em;">{', '.join(all_vis_sorted)}</p>
+            <p style="margin: 8px 0 0 0; font-size: 0.9em;">{esc(', '.join(all_vis_sorted))}</p>
         </details>
-"""
-    
+""")
+
+
+def _render_inventory_changes(parts, inv_deltas_level1, inv_deltas_others, esc_item_names):
+    """Append the level 1 (mules/traders) and regular inventory change sections."""
     # Level 1 inventory changes (mules/traders) — only actual changes
     if inv_deltas_level1:
-        html += """
+        parts.append("""
         <h2 id="inventory-changes-level1">Level 1 Inventory Changes (Mules/Traders)</h2>
         <p><em>Showing level 1 characters with inventory changes (limited to first 500 characters for performance)</em></p>
-"""
-        sorted_chars = sorted(inv_deltas_level1.keys())[:500]
+""")
+        sorted_chars = heapq.nsmallest(500, inv_deltas_level1)
         non_vis_level1 = [c for c in sorted_chars if not inv_deltas_level1[c].get('is_visibility_change')]
         for char_name in non_vis_level1:
-            delta = inv_deltas_level1[char_name]
-            html += f"""
-        <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #fff9e6;">
-            <h3><strong>{char_name}</strong> <span style="color: #666; font-size: 0.9em;">(Level 1 - Mule/Trader)</span></h3>
-"""
-            if delta['added']:
-                html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #4CAF50;">Items Added:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                for item_id, count in sorted(delta['added'].items()):
-                    item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                    count_text = f" x{count}" if count > 1 else ""
-                    html += f'<span class="item-badge item-added"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2e7d32; text-decoration: none;">{item_name}</a>{count_text}</span>'
-                html += """
-                </div>
-            </div>
-"""
-            if delta['removed']:
-                html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #f44336;">Items Removed:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                for item_id, count in sorted(delta['removed'].items()):
-                    item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                    count_text = f" x{count}" if count > 1 else ""
-                    html += f'<span class="item-badge item-removed"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #c62828; text-decoration: none;">{item_name}</a>{count_text}</span>'
-                html += """
-                </div>
-            </div>
-"""
-            html += """
-        </div>
-"""
+            _render_delta_block(
+                parts, f'<strong>{esc(char_name)}</strong> <span style="color: #666; font-size: 0.9em;">(Level 1 - Mule/Trader)</span>',
+                inv_deltas_level1[char_name], esc_item_names, bg_color='#fff9e6')
     
     # Regular inventory changes (non-level 1) — only actual changes
     if inv_deltas_others:
-        html += """
+        parts.append("""
         <h2 id="inventory-changes">Inventory Changes</h2>
         <p><em>Showing characters with inventory changes (limited to first 500 characters for performance)</em></p>
-"""
-        sorted_chars = sorted(inv_deltas_others.keys())[:500]
+""")
+        sorted_chars = heapq.nsmallest(500, inv_deltas_others)
         non_vis_others = [c for c in sorted_chars if not inv_deltas_others[c].get('is_visibility_change')]
         for char_name in non_vis_others:
-            delta = inv_deltas_others[char_name]
-            html += f"""
-        <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px;">
-            <h3><strong>{char_name}</strong></h3>
-"""
-            if delta['added']:
-                    html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #4CAF50;">Items Added:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                    for item_id, count in sorted(delta['added'].items()):
-                        item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                        count_text = f" x{count}" if count > 1 else ""
-                        html += f'<span class="item-badge item-added"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2e7d32; text-decoration: none;">{item_name}</a>{count_text}</span>'
-                    html += """
-                </div>
-            </div>
-"""
-            if delta['removed']:
-                html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #f44336;">Items Removed:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                for item_id, count in sorted(delta['removed'].items()):
-                    item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                    count_text = f" x{count}" if count > 1 else ""
-                    html += f'<span class="item-badge item-removed"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #c62828; text-decoration: none;">{item_name}</a>{count_text}</span>'
-                html += """
-                </div>
-            </div>
-"""
-            html += """
-        </div>
-"""
+            _render_delta_block(parts, f'<strong>{esc(char_name)}</strong>', inv_deltas_others[char_name], esc_item_names)
     else:
-        html += """
+        parts.append("""
         <h2>Inventory Changes</h2>
         <p class="no-changes">No inventory changes detected.</p>
-"""
-    
+""")
+
+
+def _render_tracked_items(parts, tracked_deltas, corpse_loot_chars, current_char_data, esc_item_names, tracked_source_label):
+    """Append the tracked items (raid / elemental armor / praesterium) section."""
     # Tracked Items section (raid / elemental armor / praesterium) — only actual changes
     if tracked_deltas:
-        html += """
+        parts.append("""
         <h2 id="tracked-items">📌 Tracked Items (Raid / Elemental Armor / Praesterium)</h2>
         <p><em>Changes in raid loot, elemental armor, and praesterium items — see who acquired or lost these.</em></p>
-"""
+""")
         sorted_tracked = sorted(tracked_deltas.keys())
         non_vis_tracked = [c for c in sorted_tracked if not tracked_deltas[c].get('is_visibility_change') and c not in corpse_loot_chars]
         for char_name in non_vis_tracked:
             delta = tracked_deltas[char_name]
             char_level = current_char_data.get(char_name, {}).get('level', '?')
             guild = (current_char_data.get(char_name, {}) or {}).get('guild', '')
-            char_display = f"{char_name} &lt;{guild}&gt;" if guild else char_name
+            char_display = f"{esc(char_name)} &lt;{esc(guild)}&gt;" if guild else esc(char_name)
             char_slug = char_name.lower().replace(' ', '_')
-            magelo_url = f"https://www.takproject.net/magelo/character.php?char={char_slug}"
-            html += f"""
-        <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #fff8e1;">
-            <h3><a href="{magelo_url}" target="_blank" style="text-decoration: none; font-weight: bold;">{char_display}</a> <span style="color: #666; font-size: 0.9em;">(Level {char_level})</span></h3>
-"""
-            if delta['added']:
-                html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #4CAF50;">Acquired:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                for item_id, count in sorted(delta['added'].items()):
-                    item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                    source = tracked_source_label.get(str(item_id), "")
-                    count_text = f" x{count}" if count > 1 else ""
-                    label = f" ({source})" if source else ""
-                    html += f'<span class="item-badge item-added"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #2e7d32; text-decoration: none;">{item_name}</a>{count_text}<span style="color: #888; font-size: 0.85em;">{label}</span></span>'
-                html += """
-                </div>
-            </div>
-"""
-            if delta['removed']:
-                html += """
-            <div style="margin: 10px 0;">
-                <strong style="color: #f44336;">Lost:</strong>
-                <div class="item-list" style="margin-top: 5px;">
-"""
-                for item_id, count in sorted(delta['removed'].items()):
-                    item_name = delta['item_names'].get(item_id, f"Item {item_id}")
-                    source = tracked_source_label.get(str(item_id), "")
-                    count_text = f" x{count}" if count > 1 else ""
-                    label = f" ({source})" if source else ""
-                    html += f'<span class="item-badge item-removed"><a href="https://www.takproject.net/allaclone/item.php?id={item_id}" target="_blank" style="color: #c62828; text-decoration: none;">{item_name}</a>{count_text}<span style="color: #888; font-size: 0.85em;">{label}</span></span>'
-                html += """
-                </div>
+            magelo_url = _MAGELO_URL_PREFIX + char_slug
+            _render_delta_block(
+                parts, f'<a href="{magelo_url}" target="_blank" style="text-decoration: none; font-weight: bold;">{char_display}</a> <span style="color: #666; font-size: 0.9em;">(Level {char_level})</span>',
+                delta, esc_item_names, bg_color='#fff8e1', labels=('Acquired:', 'Lost:'), source_labels=tracked_source_label)
+
+
+def generate_delta_html(current_char_data, previous_char_data, current_inv, previous_inv, 
+                        magelo_update_date, serverwide=True, char_deltas=None, inv_deltas=None,
+                        mob_tracker_deaths_path=None, observed_at=None, raid_item_sources_path=None,
+                        corpse_loot_chars=None, out=None):
+    """Generate HTML page showing deltas between current and previous magelo dump.
+    If serverwide is True, compares all characters, otherwise only mules.
+    If char_deltas and inv_deltas are provided, uses those instead of recalculating.
+    If mob_tracker_deaths_path and observed_at are set, appends (zone, mob) from this delta to the mob tracker JSON.
+    If raid_item_sources_path is set, used to drop deaths 1 day after repop window ends.
+    If corpse_loot_chars is set, use it instead of inferring from current_inv vs previous_inv.
+    If out is a writable text file, the page parts are written to it and None is returned
+    (avoids holding a joined copy of the whole page); otherwise the HTML string is returned."""
+    
+    # Compare character data (serverwide) if not provided
+    if char_deltas is None:
+        char_deltas = compare_character_data(current_char_data, previous_char_data, None if serverwide else None)
+    
+    # Compare inventories (serverwide) if not provided
+    if inv_deltas is None:
+        inv_deltas = compare_inventories(current_inv, previous_inv, None if serverwide else None)
+    
+    # Get item names for inventory deltas
+    all_item_ids = set()
+    for char_delta in inv_deltas.values():
+        all_item_ids.update(char_delta['added'].keys())
+        all_item_ids.update(char_delta['removed'].keys())
+    
+    # Try to get item names from current inventory; stop once every delta item has a name
+    item_names = {}
+    remaining = set(all_item_ids)
+    for items in current_inv.values():
+        if not remaining:
+            break
+        for item in items:
+            item_id = item['item_id']
+            if item_id in remaining:
+                item_names[item_id] = item['item_name']
+                remaining.discard(item_id)
+                if not remaining:
+                    break
+    # Deltas loaded from JSON carry their own names; use them for items not in the current inventory
+    if remaining:
+        for char_delta in inv_deltas.values():
+            for item_id, name in (char_delta.get('item_names') or {}).items():
+                item_names.setdefault(item_id, name)
+    # Escaped once here for the badge sections; the same item can appear under many characters
+    esc_item_names = {item_id: esc(name) for item_id, name in item_names.items()}
+    
+    # Load tracked item IDs (raid / elemental armor / praesterium) and filter deltas for that set
+    tracked_ids, tracked_source_label, item_zone, item_mob = load_tracked_item_ids()
+    tracked_deltas = {}
+    if tracked_ids:
+        for char_name, delta in inv_deltas.items():
+            added = {k: v for k, v in delta['added'].items() if str(k) in tracked_ids}
+            removed = {k: v for k, v in delta['removed'].items() if str(k) in tracked_ids}
+            if added or removed:
+                tracked_deltas[char_name] = {
+                    'added': added,
+                    'removed': removed,
+                    'is_visibility_change': delta.get('is_visibility_change', False),
+                }
+    
+    # Characters who went 0 equipped -> any equipped (corpse loot across day boundary): exclude from delta/raid/mob tracker
+    if corpse_loot_chars is None:
+        corpse_loot_chars = chars_corpse_loot_excluded(current_inv, previous_inv)
+    # Tracked item IDs that are NO DROP (from item_stats); non-no-drop tracked loot needs net-change verification for mob kill
+    no_drop_tracked = load_no_drop_tracked_item_ids() & tracked_ids if tracked_ids else set()
+    # Serverwide net change per tracked item (excluding corpse-loot chars) for non-no-drop kill verification
+    net_change_tracked = defaultdict(int)
+    for char_name, delta in tracked_deltas.items():
+        if char_name in corpse_loot_chars:
+            continue
+        for item_id, c in (delta.get('added') or {}).items():
+            net_change_tracked[item_id] += c
+        for item_id, c in (delta.get('removed') or {}).items():
+            net_change_tracked[item_id] -= c
+    
+    # Items by zone: only chars in BOTH snapshots (exclude visibility-change and corpse-loot); only raid zones
+    # For non-no-drop tracked loot, only add (zone, mob) when serverwide net change for that item is positive
+    # Structure: zone_entries[zone][mob] = [(char_name, item_id, item_name), ...]
+    chars_in_both = set(current_inv.keys()) & set(previous_inv.keys())
+    zone_entries = {}
+    for char_name in tracked_deltas:
+        if char_name not in chars_in_both or tracked_deltas[char_name].get('is_visibility_change') or char_name in corpse_loot_chars:
+            continue
+        delta = tracked_deltas[char_name]
+        for item_id, count in (delta.get('added') or {}).items():
+            # Non-no-drop tracked loot: only count toward mob kill if serverwide net change is positive
+            if str(item_id) not in no_drop_tracked and net_change_tracked.get(item_id, 0) <= 0:
+                continue
+            zone = item_zone.get(str(item_id))
+            if not zone:
+                continue
+            mob = item_mob.get(str(item_id), "")
+            item_name = item_names.get(item_id, f"Item {item_id}")
+            if zone not in zone_entries:
+                zone_entries[zone] = {}
+            if mob not in zone_entries[zone]:
+                zone_entries[zone][mob] = []
+            for _ in range(count):
+                zone_entries[zone][mob].append((char_name, item_id, item_name))
+    
+    if zone_entries and mob_tracker_deaths_path and observed_at is not None:
+        save_mob_deaths_from_delta(zone_entries, mob_tracker_deaths_path, observed_at=observed_at,
+                                   raid_item_sources_path=raid_item_sources_path)
+    
+    # Leaderboards: only consider characters present in BOTH snapshots (explicit presence), minus corpse-loot
+    chars_in_both = set(current_char_data.keys()) & set(previous_char_data.keys())
+    chars_eligible_leaderboard = chars_in_both - corpse_loot_chars
+    
+    # For display: still compute visibility-change set (anon ↔ not-anon) for character table and visibility note
+    visibility_change_chars = {name for name, inv_d in inv_deltas.items() if inv_d.get('is_visibility_change')}
+    for name, char_d in char_deltas.items():
+        if char_d.get('is_visibility_change'):
+            visibility_change_chars.add(name)
+    visibility_change_chars |= corpse_loot_chars
+    
+    # Leaderboard candidates: only chars present in both snapshots, exclude new/deleted, visibility-change, and corpse-loot
+    leaderboard_deltas = [
+        (char_name, delta) for char_name, delta in char_deltas.items()
+        if char_name in chars_eligible_leaderboard
+        and not delta.get('is_deleted', False) and not delta.get('is_new', False)
+        and not delta.get('is_visibility_change', False)
+    ]
+    
+    # AA leaderboard (top 20 gainers): only level 50+ characters that gained AA
+    aa_leaderboard = heapq.nlargest(20, (
+        {
+            'name': char_name,
+            'class': delta['class'],
+            'level': delta['current_level'],
+            'aa_gain': delta['aa_total_change'],
+            'aa_total': delta['current_aa_total']
+        }
+        for char_name, delta in leaderboard_deltas
+        if (delta['current_level'] >= 50 or delta['previous_level'] >= 50) and delta['aa_total_change'] > 0
+    ), key=itemgetter('aa_gain'))
+    
+    # HP leaderboard (top 20 gainers): any level that gained HP
+    hp_leaderboard = heapq.nlargest(20, (
+        {
+            'name': char_name,
+            'class': delta['class'],
+            'level': delta['current_level'],
+            'hp_gain': delta['hp_change'],
+            'hp_total': delta['current_hp']
+        }
+        for char_name, delta in leaderboard_deltas
+        if delta['hp_change'] > 0
+    ), key=itemgetter('hp_gain'))
+    
+    parts = [_DELTA_HTML_HEADER.format(css=_DELTA_PAGE_CSS, date=magelo_update_date)]
+    
+    # Split inventory deltas by level 1 (mules/traders) vs others; exclude corpse-loot chars from display
+    # Current level per displayed character, looked up once
+    delta_levels = {
+        char_name: current_char_data.get(char_name, {}).get('level', 0)
+        for char_name in inv_deltas if char_name not in corpse_loot_chars
+    }
+    inv_deltas_level1 = {c: inv_deltas[c] for c, level in delta_levels.items() if level == 1}
+    inv_deltas_others = {c: inv_deltas[c] for c, level in delta_levels.items() if level != 1}
+    
+    # Calculate week and month for leaderboard links
+    week_start = None
+    month_start = None
+    try:
+        if magelo_update_date != 'Unknown':
+            try:
+                dt = datetime.strptime(magelo_update_date, '%a %b %d %H:%M:%S UTC %Y')
+                date_str = dt.strftime('%Y-%m-%d')
+            except:
+                date_str = datetime.now().strftime('%Y-%m-%d')
+        else:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+        
+        week_start = get_week_start(date_str)
+        month_start = get_month_start(date_str)
+    except Exception as e:
+        print(f"Warning: Could not calculate week/month for leaderboard links: {e}")
+    
+    # Build navigation links based on what sections will be shown (Items by Zone first)
+    nav_links = []
+    if zone_entries:
+        nav_links.append('<a href="#items-by-zone">📍 Items by Zone</a>')
+    if aa_leaderboard:
+        nav_links.append('<a href="#aa-leaderboard">🏆 AA Leaderboard</a>')
+    if hp_leaderboard:
+        nav_links.append('<a href="#hp-leaderboard" class="hp-link">❤️ HP Leaderboard</a>')
+    if char_deltas:
+        nav_links.append('<a href="#character-changes">Character Changes</a>')
+    if inv_deltas_level1:
+        nav_links.append('<a href="#inventory-changes-level1">Level 1 (Mules/Traders)</a>')
+    if inv_deltas_others:
+        nav_links.append('<a href="#inventory-changes">Inventory Changes</a>')
+    if tracked_deltas:
+        nav_links.append('<a href="#tracked-items" style="background-color: #FF9800;">📌 Tracked Items</a>')
+    
+    # Add weekly/monthly leaderboard links
+    if week_start:
+        nav_links.append(f'<a href="leaderboard_week_{week_start}.html" style="background-color: #2196F3;">📅 Weekly Leaderboard</a>')
+    if month_start:
+        nav_links.append(f'<a href="leaderboard_month_{month_start}.html" style="background-color: #9C27B0;">📆 Monthly Leaderboard</a>')
+    # Add delta history link (for date range queries)
+    nav_links.append('<a href="delta-history.html" style="background-color: #607D8B;">📜 Delta History</a>')
+    # Raid mob repop tracker (deaths + repop windows)
+    nav_links.append('<a href="mob_tracker.html" style="background-color: #795548;">⏱ Raid Mob Repop Tracker</a>')
+    
+    parts.append("".join(nav_links))
+    parts.append("""
             </div>
-"""
-            html += """
         </div>
-"""
+""")
     
-    html += """
-    </div>
-""" + GOATCOUNTER_SCRIPT + """
-</body>
-</html>
-"""
+    _render_zone_items(parts, zone_entries, current_char_data)
+    _render_delta_leaderboards(parts, aa_leaderboard, hp_leaderboard)
     
-    return html
+    parts.append("""
+""")
+    
+    _render_character_changes(parts, char_deltas, visibility_change_chars)
+    _render_visibility_note(parts, visibility_change_chars, inv_deltas_level1, inv_deltas_others, tracked_deltas)
+    _render_inventory_changes(parts, inv_deltas_level1, inv_deltas_others, esc_item_names)
+    _render_tracked_items(parts, tracked_deltas, corpse_loot_chars, current_char_data, esc_item_names, tracked_source_label)
+    
+    parts.append(_DELTA_HTML_FOOTER)
+    
+    if out is not None:
+        out.writelines(parts)
+        return None
+    return ''.join(parts)
 
-def generate_leaderboard_html(period_name, aa_leaderboard, hp_leaderboard, period_type):
-    """Generate HTML for weekly or monthly leaderboard page."""
-    html = f"""<!DOCTYPE html>
+# Static head pieces of the weekly/monthly leaderboard page (generate_leaderboard_html)
+_LEADERBOARD_HEAD_PRE = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>TAKP {period_name.title()} Leaderboard</title>
-    <style>
-        body {{
+"""
+
+_LEADERBOARD_PAGE_CSS = """    <style>
+        body {
             font-family: Arial, sans-serif;
             margin: 20px;
             background-color: #f5f5f5;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1600px;
             margin: 0 auto;
             background-color: white;
             padding: 20px;
             border-radius: 8px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
+        }
+        h1 {
             color: #333;
             border-bottom: 3px solid #4CAF50;
             padding-bottom: 10px;
-        }}
-        .leaderboard {{
+        }
+        .leaderboard {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 20px;
             border-radius: 8px;
             margin: 20px 0;
-        }}
-        .leaderboard h2 {{
+        }
+        .leaderboard h2 {
             color: white;
             border-bottom: 2px solid rgba(255,255,255,0.3);
             padding-bottom: 10px;
             margin-top: 0;
-        }}
-        .leaderboard-table {{
+        }
+        .leaderboard-table {
             width: 100%;
             border-collapse: collapse;
             background-color: rgba(255,255,255,0.1);
             border-radius: 5px;
             overflow: hidden;
-        }}
-        .leaderboard-table th {{
+        }
+        .leaderboard-table th {
             background-color: rgba(255,255,255,0.2);
             padding: 12px;
             text-align: left;
             font-weight: bold;
-        }}
-        .leaderboard-table td {{
+        }
+        .leaderboard-table td {
             padding: 10px 12px;
             border-bottom: 1px solid rgba(255,255,255,0.1);
-        }}
-        .rank-badge {{
+        }
+        .rank-badge {
             display: inline-block;
             width: 30px;
             height: 30px;
@@ -2560,21 +2622,52 @@ def generate_leaderboard_html(period_name, aa_leaderboard, hp_leaderboard, perio
             border-radius: 50%;
             font-weight: bold;
             margin-right: 10px;
-        }}
-        .rank-1 {{ background-color: #FFD700; color: #000; }}
-        .rank-2 {{ background-color: #C0C0C0; color: #000; }}
-        .rank-3 {{ background-color: #CD7F32; color: #fff; }}
-        .rank-other {{ background-color: rgba(255,255,255,0.3); color: #fff; }}
+        }
+        .rank-1 { background-color: #FFD700; color: #000; }
+        .rank-2 { background-color: #C0C0C0; color: #000; }
+        .rank-3 { background-color: #CD7F32; color: #fff; }
+        .rank-other { background-color: rgba(255,255,255,0.3); color: #fff; }
     </style>
-</head>
+"""
+
+
+# One row of a weekly/monthly leaderboard table; filled from the entry dict plus rank fields
+_LEADERBOARD_ROW_TMPL = """
+                    <tr>
+                        <td><span class="rank-badge {rank_class}">{idx}</span></td>
+                        <td><strong>{name}</strong></td>
+                        <td>{class}</td>
+                        <td>{level}</td>
+                        <td style="color: #fff; font-weight: bold;">+{gain}</td>
+                    </tr>
+"""
+
+
+# Rank badge class by 1-based rank; index 0 is unused and ranks past 3 clamp to the last slot
+_RANK_CLASSES = ('rank-other', 'rank-1', 'rank-2', 'rank-3', 'rank-other')
+
+
+def _render_leaderboard_rows(leaderboard):
+    """Render all rows of one leaderboard table as a single string."""
+    row = _LEADERBOARD_ROW_TMPL.format
+    return ''.join(
+        row(rank_class=_RANK_CLASSES[min(idx, 4)], idx=idx, **entry)
+        for idx, entry in enumerate(leaderboard, 1)
+    )
+
+
+def generate_leaderboard_html(period_name, aa_leaderboard, hp_leaderboard, period_type):
+    """Generate HTML for weekly or monthly leaderboard page."""
+    parts = [_LEADERBOARD_HEAD_PRE, f"    <title>TAKP {period_name.title()} Leaderboard</title>\n", _LEADERBOARD_PAGE_CSS,
+             f"""</head>
 <body>
     <div class="container">
         <h1>TAKP {period_name} Leaderboard</h1>
-"""
+"""]
     
     # AA Leaderboard
     if aa_leaderboard:
-        html += """
+        parts.append("""
         <div class="leaderboard">
             <h2>🏆 Top AA Gainers</h2>
             <table class="leaderboard-table">
@@ -2588,27 +2681,17 @@ def generate_leaderboard_html(period_name, aa_leaderboard, hp_leaderboard, perio
                     </tr>
                 </thead>
                 <tbody>
-"""
-        for idx, entry in enumerate(aa_leaderboard, 1):
-            rank_class = "rank-1" if idx == 1 else "rank-2" if idx == 2 else "rank-3" if idx == 3 else "rank-other"
-            html += f"""
-                    <tr>
-                        <td><span class="rank-badge {rank_class}">{idx}</span></td>
-                        <td><strong>{entry['name']}</strong></td>
-                        <td>{entry['class']}</td>
-                        <td>{entry['level']}</td>
-                        <td style="color: #fff; font-weight: bold;">+{entry['gain']}</td>
-                    </tr>
-"""
-        html += """
+""")
+        parts.append(_render_leaderboard_rows(aa_leaderboard))
+        parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
     
     # HP Leaderboard
     if hp_leaderboard:
-        html += """
+        parts.append("""
         <div class="leaderboard" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
             <h2>❤️ Top HP Gainers</h2>
             <table class="leaderboard-table">
@@ -2622,31 +2705,21 @@ def generate_leaderboard_html(period_name, aa_leaderboard, hp_leaderboard, perio
                     </tr>
                 </thead>
                 <tbody>
-"""
-        for idx, entry in enumerate(hp_leaderboard, 1):
-            rank_class = "rank-1" if idx == 1 else "rank-2" if idx == 2 else "rank-3" if idx == 3 else "rank-other"
-            html += f"""
-                    <tr>
-                        <td><span class="rank-badge {rank_class}">{idx}</span></td>
-                        <td><strong>{entry['name']}</strong></td>
-                        <td>{entry['class']}</td>
-                        <td>{entry['level']}</td>
-                        <td style="color: #fff; font-weight: bold;">+{entry['gain']}</td>
-                    </tr>
-"""
-        html += """
+""")
+        parts.append(_render_leaderboard_rows(hp_leaderboard))
+        parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
     
-    html += """
+    parts.extend(("""
     </div>
-""" + GOATCOUNTER_SCRIPT + """
+""", GOATCOUNTER_SCRIPT, """
 </body>
 </html>
-"""
-    return html
+"""))
+    return ''.join(parts)
 
 def generate_date_range_delta_html(start_date, end_date, base_dir='delta_snapshots', magelo_update_date='Unknown'):
     """Generate HTML for a date range delta by loading and aggregating daily delta JSONs.
@@ -2718,66 +2791,35 @@ def generate_date_range_delta_html(start_date, end_date, base_dir='delta_snapsho
     # Add a header note about the date range
     header_note = f"""
     <div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 5px solid #2196F3;">
-        <h2 style="margin-top: 0; color: #1976D2;">Date Range: {start_date} to {end_date}</h2>
-        <p>This report shows aggregated changes across {start_date} to {end_date}, reconstructed from daily delta JSON files.</p>
-        <p><strong>Note:</strong> This is a reconstructed view. For the most recent daily changes, see the <a href="delta.html">current delta report</a>.</p>
-    </div>
-"""
-    
-    # Insert the header note after the opening container div
-    html = html.replace('<div class="container">', '<div class="container">' + header_note)
-    
-    return html
-
-def generate_delta_history(base_dir):
-    """Generate a history page listing all available daily delta JSON files.
-    Allows generating date-to-date delta comparisons on demand."""
-    import glob
-    import re
-    
-    # Load tracked item IDs so we can embed them for the client-side report (Tracked Items + Items by zone)
-    tracked_ids, tracked_source_label, item_zone, item_mob = load_tracked_item_ids()
-    tracked_ids_json = json.dumps(list(tracked_ids))
-    tracked_source_json = json.dumps(tracked_source_label)
-    tracked_item_zone_json = json.dumps(item_zone)
-    tracked_item_mob_json = json.dumps(item_mob)
-    # Tracked item IDs that are NO DROP (for mob kill verification: non-no-drop only counts when net change > 0)
-    no_drop_tracked = load_no_drop_tracked_item_ids() & tracked_ids if tracked_ids else set()
-    no_drop_tracked_json = json.dumps(list(no_drop_tracked))
-    
-    # Find all daily delta JSON files
-    delta_snapshots_dir = os.path.join(base_dir, 'delta_snapshots')
-    delta_files = []
-    
-    if os.path.exists(delta_snapshots_dir):
-        # Find all delta_daily_YYYY-MM-DD.json.gz files (compressed)
-        delta_files.extend(glob.glob(os.path.join(delta_snapshots_dir, "delta_daily_*.json.gz")))
-    
-    # Extract dates from filenames and sort
-    delta_entries = []
-    for filepath in delta_files:
-        filename = os.path.basename(filepath)
-        # Match both .json and .json.gz files
-        match = re.match(r'delta_daily_(\d{4}-\d{2}-\d{2})\.json(\.gz)?', filename)
-        if match:
-            date_str = match.group(1)
-            try:
-                dt = datetime.strptime(date_str, '%Y-%m-%d')
-                delta_entries.append({
-                    'date': date_str,
-                    'date_formatted': dt.strftime('%B %d, %Y'),
-                    'filename': filename,
-                    'filepath': filepath,
-                    'timestamp': os.path.getmtime(filepath)
-                })
-            except:
-                pass
+        <h2 style="margin-top: 0; color: #1976D2;">Date Range: {start_date} to {end_date}</h2>
+        <p>This report shows aggregated changes across {start_date} to {end_date}, reconstructed from daily delta JSON files.</p>
+        <p><strong>Note:</strong> This is a reconstructed view. For the most recent daily changes, see the <a href="delta.html">current delta report</a>.</p>
+    </div>
+"""
     
-    # Sort by date (newest first)
-    delta_entries.sort(key=lambda x: x['date'], reverse=True)
+    # Insert the header note after the opening container div
+    html = html.replace('<div class="container">', '<div class="container">' + header_note)
     
-    # Generate HTML with date-to-date comparison interface
-    html = """<!DOCTYPE html>
+    return html
+
+# Daily delta files listed on the delta history page
+_DELTA_FN_RE = re.compile(r'delta_daily_(\d{4}-\d{2}-\d{2})\.json\.gz$')
+
+_MONTH_NAMES = ('January', 'February', 'March', 'April', 'May', 'June',
+                'July', 'August', 'September', 'October', 'November', 'December')
+
+
+@lru_cache(maxsize=4096)
+def _fmt_date(date_str):
+    """Format 'YYYY-MM-DD' as 'Month DD, YYYY' (same text as strftime('%B %d, %Y')).
+    Raises ValueError for an invalid date."""
+    year, month, day = map(int, date_str.split('-'))
+    datetime(year, month, day)  # validate (e.g. reject 2026-02-30)
+    return f"{_MONTH_NAMES[month - 1]} {day:02d}, {year}"
+
+
+# Static <head> (title, pako loader, stylesheet) of the delta history page (generate_delta_history)
+_DELTA_HISTORY_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -2904,80 +2946,54 @@ def generate_delta_history(base_dir):
         .info-box strong {
             color: #856404;
         }
+        /* Date range report (rendered client-side) */
+        .drt-card { margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; }
+        .drt-card-level1 { background-color: #fff9e6; }
+        .drt-card-tracked { background-color: #fff8e1; }
+        .drt-card-zone { background-color: #f5f5f5; }
+        .drt-card-title { margin-top: 0; }
+        .drt-side { margin: 10px 0; }
+        .drt-items { margin-top: 5px; }
+        .drt-added-label { color: #4CAF50; }
+        .drt-removed-label { color: #f44336; }
+        .drt-badge { display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; border-radius: 4px; }
+        .drt-added { background: #e8f5e9; }
+        .drt-added a, .drt-zone-item { color: #2e7d32; }
+        .drt-removed { background: #ffebee; }
+        .drt-removed a { color: #c62828; }
+        .drt-source { color: #888; font-size: 0.85em; }
+        .drt-td { padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }
+        .drt-char-link { text-decoration: none; font-weight: bold; }
+        .drt-note { color: #666; font-size: 0.9em; }
+        .drt-muted { color: #666; }
+        .drt-gain-pos { color: #4CAF50; font-weight: bold; }
+        .drt-gain-neg { color: #f44336; font-weight: bold; }
+        .drt-lead-row { border-bottom: 1px solid rgba(255,255,255,0.1); }
+        .drt-lead-th { background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold; }
+        .drt-th { padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold; }
+        .drt-rank { display: inline-block; width: 30px; height: 30px; line-height: 30px; text-align: center; border-radius: 50%; font-weight: bold; }
+        .drt-rank-1 { background-color: #FFD700; color: #000; }
+        .drt-rank-2 { background-color: #C0C0C0; color: #000; }
+        .drt-rank-3 { background-color: #CD7F32; color: #fff; }
+        .drt-rank-other { background-color: rgba(255,255,255,0.3); color: #fff; }
+        .drt-lead-td { padding: 10px 12px; }
+        .drt-lead-aa-gain { color: #4CAF50; font-weight: bold; }
+        .drt-lead-hp-gain { color: #fff; font-weight: bold; }
+        .drt-zone-list { margin: 0; padding-left: 20px; }
+        .drt-mob { margin: 12px 0 6px 0; font-size: 1em; color: #555; }
     </style>
 </head>
-<body>
-    <div class="container">
-        <h1>📜 TAKP Delta History & Date Range Generator</h1>
-        <div class="nav-links">
-            <a href="delta.html">← Current Delta Report</a>
-            <a href="spell_inventory.html">← Spell Inventory</a>
-        </div>
-        
-        <div class="info-box">
-            <strong>ℹ️ How it works:</strong> Historical deltas are stored as JSON files (much smaller than HTML). 
-            Use the form below to generate a date-to-date comparison report for any date range. 
-            The report will be reconstructed from daily delta JSONs on demand.
-        </div>
-        
-        <div class="date-range-form">
-            <h3>Generate Date-to-Date Delta Report</h3>
-            <p>Select start and end dates, then use the generated command to create a date range report:</p>
-            <div class="form-group">
-                <label for="start_date">Start Date:</label>
-                <input type="date" id="start_date" name="start" required>
-            </div>
-            <div class="form-group">
-                <label for="end_date">End Date:</label>
-                <input type="date" id="end_date" name="end" required>
-            </div>
-            <div class="form-group">
-                <button type="button" onclick="generateDateRangeReport()" style="background: #4CAF50; color: white; padding: 8px 16px; border: none; border-radius: 4px; cursor: pointer;">Generate Report</button>
-            </div>
-            <div id="date_range_output" style="margin-top: 20px; padding: 15px; background: #f9f9f9; border-radius: 5px; min-height: 50px;"></div>
-        </div>
-        
-        <div class="stats">
-            <strong>Available Daily Delta JSON Files:</strong> """ + str(len(delta_entries)) + """
-            <br><small>These JSON files contain daily changes and can be used to reconstruct any date range.</small>
-        </div>
-        
-        <div class="delta-list">
-            <h2>Available Dates</h2>
-"""
-    
-    if delta_entries:
-        html += "            <p>Click on a date to use it in the date range form above:</p>\n"
-        html += "            <div style='display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 10px; margin-top: 15px;'>\n"
-        for entry in delta_entries:
-            html += f"""
-                <div class="delta-entry" style="flex-direction: column; align-items: flex-start; cursor: pointer;" 
-                     onclick="document.getElementById('start_date').value='{entry['date']}'; document.getElementById('end_date').value='{entry['date']}';">
-                    <strong>{entry['date_formatted']}</strong>
-                    <div class="delta-date">{entry['date']}</div>
-                </div>
-"""
-        html += "            </div>\n"
-    else:
-        html += """
-            <p>No daily delta JSON files found yet. Daily deltas will appear here once they are generated.</p>
-            <p><em>Note: Daily delta JSONs are automatically saved when the delta report is generated.</em></p>
 """
-    
-    html += """
-        </div>
-    </div>
-    <script type="application/json" id="tracked-item-ids">""" + tracked_ids_json.replace("</", "<\\/") + """</script>
-    <script type="application/json" id="tracked-source-label">""" + tracked_source_json.replace("</", "<\\/") + """</script>
-    <script type="application/json" id="tracked-item-zone">""" + tracked_item_zone_json.replace("</", "<\\/") + """</script>
-    <script type="application/json" id="tracked-item-mob">""" + tracked_item_mob_json.replace("</", "<\\/") + """</script>
-    <script type="application/json" id="no-drop-tracked-ids">""" + no_drop_tracked_json.replace("</", "<\\/") + """</script>
-    <script>
-        const TRACKED_ITEM_IDS = new Set(JSON.parse((document.getElementById('tracked-item-ids') || { textContent: '[]' }).textContent));
+
+
+# Client-side date range report of the delta history page; reads the tracked-item JSON blocks emitted before it
+_DELTA_HISTORY_SCRIPT = """    <script>
+        // Ids are kept as strings so lookups can use Object.keys() results directly
+        const TRACKED_ITEM_IDS = new Set(JSON.parse((document.getElementById('tracked-item-ids') || { textContent: '[]' }).textContent).map(String));
         const TRACKED_SOURCE_LABEL = JSON.parse((document.getElementById('tracked-source-label') || { textContent: '{}' }).textContent);
         const TRACKED_ITEM_ZONE = JSON.parse((document.getElementById('tracked-item-zone') || { textContent: '{}' }).textContent);
         const TRACKED_ITEM_MOB = JSON.parse((document.getElementById('tracked-item-mob') || { textContent: '{}' }).textContent);
-        const NO_DROP_TRACKED_IDS = new Set(JSON.parse((document.getElementById('no-drop-tracked-ids') || { textContent: '[]' }).textContent));
+        const NO_DROP_TRACKED_IDS = new Set(JSON.parse((document.getElementById('no-drop-tracked-ids') || { textContent: '[]' }).textContent).map(String));
         // Set default dates (today and 7 days ago)
         const today = new Date().toISOString().split('T')[0];
         const weekAgo = new Date();
@@ -3006,9 +3022,39 @@ def generate_delta_history(base_dir):
                 throw new Error(`No delta JSON file available for ${date}. Please select a date from the available dates list.`);
             }
             
+            // Cache the in-flight promise, so concurrent requests for one date share a single fetch
             if (loadedDeltas.has(date)) {
                 return loadedDeltas.get(date);
             }
+            const pending = fetchDeltaJSON(date);
+            loadedDeltas.set(date, pending);
+            pending.catch(() => loadedDeltas.delete(date));
+            return pending;
+        }
+        
+        // Decompress a .json.gz response. When the body is streamable, chunks are inflated as they arrive so
+        // decompression overlaps the download instead of running over the whole buffer afterwards.
+        async function inflateResponse(response) {
+            if (!response.body || !response.body.getReader || !pako.Inflate) {
+                return pako.inflate(new Uint8Array(await response.arrayBuffer()), { to: 'string' });
+            }
+            const inflator = new pako.Inflate({ to: 'string' });
+            const reader = response.body.getReader();
+            for (;;) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                inflator.push(value, false);
+                if (inflator.err) {
+                    throw new Error(`Failed to decompress ${response.url || 'response'}: ${inflator.msg}`);
+                }
+            }
+            if (typeof inflator.result !== 'string') {
+                throw new Error(`Failed to decompress ${response.url || 'response'}: truncated data`);
+            }
+            return inflator.result;
+        }
+        
+        async function fetchDeltaJSON(date) {
             try {
                 const response = await fetch(`delta_snapshots/delta_daily_${date}.json.gz`);
                 if (!response.ok) {
@@ -3017,12 +3063,9 @@ def generate_delta_history(base_dir):
                     }
                     throw new Error(`Failed to load delta for ${date}: HTTP ${response.status}`);
                 }
-                const arrayBuffer = await response.arrayBuffer();
                 // Decompress using pako
-                const decompressed = pako.inflate(new Uint8Array(arrayBuffer), { to: 'string' });
-                const delta = JSON.parse(decompressed);
-                loadedDeltas.set(date, delta);
-                return delta;
+                const decompressed = await inflateResponse(response);
+                return JSON.parse(decompressed);
             } catch (error) {
                 console.error(`Error loading delta for ${date}:`, error);
                 throw error; // Re-throw so caller can handle it
@@ -3032,12 +3075,18 @@ def generate_delta_history(base_dir):
         async function loadBaseline(baselineDate) {
             // Try to load baseline file (compressed .json.gz)
             // First try archived baseline_master_YYYY-MM-DD.json.gz, then current baseline_master.json.gz
-            const baselineKey = `baseline_${baselineDate}`;
-            const cacheKey = baselineKey + '_result';
-            if (loadedBaselines && loadedBaselines.has(cacheKey)) {
+            // Start and end usually share a baseline; caching the in-flight promise avoids downloading it twice
+            const cacheKey = `baseline_${baselineDate}_result`;
+            if (loadedBaselines.has(cacheKey)) {
                 return loadedBaselines.get(cacheKey);
             }
-            
+            const pending = fetchBaseline(baselineDate);
+            loadedBaselines.set(cacheKey, pending);
+            pending.catch(() => loadedBaselines.delete(cacheKey));
+            return pending;
+        }
+        
+        async function fetchBaseline(baselineDate) {
             const currentUrl = `delta_snapshots/baseline_master.json.gz`;
             const archivedUrl = `delta_snapshots/baseline_master_${baselineDate}.json.gz`;
             let usedFallback = false;
@@ -3067,37 +3116,28 @@ def generate_delta_history(base_dir):
                     }
                     const text = await response.text();
                     const baseline = JSON.parse(text);
-                    if (!loadedBaselines) {
-                        loadedBaselines = new Map();
-                    }
-                    const result = { baseline, usedFallback };
-                    loadedBaselines.set(cacheKey, result);
-                    return result;
+                    return { baseline, usedFallback };
                 }
                 // Parse compressed JSON (from archived or current .json.gz)
-                const arrayBuffer = await response.arrayBuffer();
-                const decompressed = pako.inflate(new Uint8Array(arrayBuffer), { to: 'string' });
+                const decompressed = await inflateResponse(response);
                 const baseline = JSON.parse(decompressed);
-                if (!loadedBaselines) {
-                    loadedBaselines = new Map();
-                }
-                const result = { baseline, usedFallback };
-                loadedBaselines.set(cacheKey, result);
-                return result;
+                return { baseline, usedFallback };
             } catch (error) {
                 console.error(`Error loading baseline for ${baselineDate}:`, error);
                 throw error;
             }
         }
         
-        function reconstructCharacterState(baseline, delta) {
-            // Reconstruct full character state by combining baseline + delta
-            const fullState = {};
-            
-            // Start with baseline characters
+        // Normalised per-character records for each baseline object. Start and end dates usually share the
+        // master baseline, so this runs once per baseline; the records are shared and never mutated.
+        const baselineStateCache = new WeakMap();
+        function baselineCharacterState(baseline) {
+            let baseState = baselineStateCache.get(baseline);
+            if (baseState) return baseState;
+            baseState = {};
             const baselineChars = baseline.characters || {};
             for (const [charName, charData] of Object.entries(baselineChars)) {
-                fullState[charName] = {
+                baseState[charName] = {
                     level: charData.level || 0,
                     aa_total: (charData.aa_unspent || 0) + (charData.aa_spent || 0),
                     hp: charData.hp_max_total || 0,
@@ -3105,6 +3145,14 @@ def generate_delta_history(base_dir):
                     guild: charData.guild || ''
                 };
             }
+            baselineStateCache.set(baseline, baseState);
+            return baseState;
+        }
+        
+        function reconstructCharacterState(baseline, delta) {
+            // Reconstruct full character state by combining baseline + delta. Unchanged characters share the
+            // baseline record; characters touched by the delta get a fresh one (copy-on-write).
+            const fullState = { ...baselineCharacterState(baseline) };
             
             // Apply delta changes
             const deltaChars = delta.char_deltas || {};
@@ -3114,7 +3162,8 @@ def generate_delta_history(base_dir):
                     continue;
                 }
                 
-                if (deltaData.is_new || !fullState[charName]) {
+                const prev = fullState[charName];
+                if (deltaData.is_new || !prev) {
                     // New character - use current values from delta
                     fullState[charName] = {
                         level: deltaData.current_level || 0,
@@ -3125,22 +3174,114 @@ def generate_delta_history(base_dir):
                     };
                 } else {
                     // Update existing character - delta has current values (baseline + changes)
-                    fullState[charName].level = deltaData.current_level || fullState[charName].level;
-                    fullState[charName].aa_total = deltaData.current_aa_total || fullState[charName].aa_total;
-                    fullState[charName].hp = deltaData.current_hp || fullState[charName].hp;
-                    if (deltaData.class) {
-                        fullState[charName].class = deltaData.class;
-                    }
-                    if (deltaData.hasOwnProperty('guild')) {
-                        fullState[charName].guild = deltaData.guild || '';
-                    }
+                    fullState[charName] = {
+                        level: deltaData.current_level || prev.level,
+                        aa_total: deltaData.current_aa_total || prev.aa_total,
+                        hp: deltaData.current_hp || prev.hp,
+                        class: deltaData.class || prev.class,
+                        guild: deltaData.hasOwnProperty('guild') ? (deltaData.guild || '') : prev.guild
+                    };
                 }
             }
             
             return fullState;
         }
         
+        // Keys of a then b as one Set, without building the intermediate Object.keys()/spread arrays
+        function keyUnion(a, b) {
+            const keys = new Set();
+            for (const k in a) keys.add(k);
+            for (const k in b) keys.add(k);
+            return keys;
+        }
+        
+        // Resolve on a fresh task, letting the browser paint status text and handle input between phases
+        function yieldToBrowser() {
+            return new Promise(resolve => setTimeout(resolve, 0));
+        }
+        
+        // Resolve once the next frame has rendered, so content inserted before the call is actually on screen
+        // (a bare setTimeout yield can run before the browser paints). Hidden tabs get no frames; fall back there.
+        function yieldForPaint() {
+            if (typeof requestAnimationFrame !== 'function' || document.hidden) return yieldToBrowser();
+            return new Promise(resolve => requestAnimationFrame(() => setTimeout(resolve, 0)));
+        }
+        
+        // Top-k by numeric score without sorting every candidate: a size-k min-heap whose root is the weakest kept
+        // entry. Equal scores keep offer order (earlier wins), matching a stable descending sort.
+        class TopK {
+            constructor(k) {
+                this.k = k;
+                this.heap = [];
+                this.seq = 0;
+            }
+            // a ranks below b: lower score, or same score offered later
+            static below(a, b) {
+                return a.score < b.score || (a.score === b.score && a.seq > b.seq);
+            }
+            // makeItem is only called for candidates that enter the heap
+            offer(score, makeItem) {
+                const heap = this.heap;
+                const seq = this.seq++;
+                if (heap.length < this.k) {
+                    heap.push({ score, seq, item: makeItem() });
+                    let i = heap.length - 1;
+                    while (i > 0) {
+                        const parent = (i - 1) >> 1;
+                        if (!TopK.below(heap[i], heap[parent])) break;
+                        [heap[i], heap[parent]] = [heap[parent], heap[i]];
+                        i = parent;
+                    }
+                    return;
+                }
+                // A later offer only displaces the root with a strictly higher score
+                if (this.k === 0 || score <= heap[0].score) return;
+                heap[0] = { score, seq, item: makeItem() };
+                let i = 0;
+                for (;;) {
+                    const left = 2 * i + 1;
+                    const right = left + 1;
+                    let low = i;
+                    if (left < heap.length && TopK.below(heap[left], heap[low])) low = left;
+                    if (right < heap.length && TopK.below(heap[right], heap[low])) low = right;
+                    if (low === i) break;
+                    [heap[i], heap[low]] = [heap[low], heap[i]];
+                    i = low;
+                }
+            }
+            // Kept items, best first
+            sorted() {
+                return this.heap.slice().sort((a, b) => b.score - a.score || a.seq - b.seq).map(node => node.item);
+            }
+        }
+        
+        // Static table headers and rank badges for the date range report, built once per page load
+        const AA_LEADERBOARD_HEAD = '<thead><tr><th class="drt-lead-th">Rank</th><th class="drt-lead-th">Character</th><th class="drt-lead-th">Class</th><th class="drt-lead-th">Level</th><th class="drt-lead-th">AA Gained</th><th class="drt-lead-th">Total AA</th></tr></thead>';
+        const HP_LEADERBOARD_HEAD = '<thead><tr><th class="drt-lead-th">Rank</th><th class="drt-lead-th">Character</th><th class="drt-lead-th">Class</th><th class="drt-lead-th">Level</th><th class="drt-lead-th">HP Gained</th><th class="drt-lead-th">Total HP</th></tr></thead>';
+        const CHAR_CHANGES_HEAD = '<thead><tr><th class="drt-th">Character</th><th class="drt-th">Class</th><th class="drt-th">Level</th><th class="drt-th">Level Change</th><th class="drt-th">Total AA</th><th class="drt-th">AA Total Change</th></tr></thead>';
+        const RANK_CLASSES = ['drt-rank drt-rank-1', 'drt-rank drt-rank-2', 'drt-rank drt-rank-3', 'drt-rank drt-rank-other'];
+        // Fixed pieces of one item badge: OPEN + itemId + LINK_MID + name + LINK_END + count [+ source] + BADGE_END
+        const ITEM_URL_PREFIX = 'https://www.takproject.net/allaclone/item.php?id=';
+        const ADDED_BADGE_OPEN = '<span class="drt-badge drt-added"><a href="' + ITEM_URL_PREFIX;
+        const REMOVED_BADGE_OPEN = '<span class="drt-badge drt-removed"><a href="' + ITEM_URL_PREFIX;
+        const BADGE_LINK_MID = '" target="_blank">';
+        const BADGE_LINK_END = '</a>';
+        const BADGE_SOURCE_OPEN = '<span class="drt-source">';
+        const BADGE_END = '</span>';
+        
+        // Level 1 inventory cards rendered per idle slice; reportRun lets a new report cancel pending slices
+        const LEVEL1_CARD_BATCH = 25;
+        let reportRun = 0;
+        function whenIdle(callback) {
+            if (typeof requestIdleCallback === 'function') {
+                requestIdleCallback(callback, { timeout: 200 });
+            } else {
+                setTimeout(callback, 0);
+            }
+        }
+        
         async function generateDateRangeReport() {
+            const run = ++reportRun;
             let start = document.getElementById('start_date').value;
             let end = document.getElementById('end_date').value;
             if (!start || !end) {
@@ -3173,11 +3314,13 @@ def generate_delta_history(base_dir):
             outputDiv.innerHTML = '<p>Loading deltas and baselines for ' + start + ' and ' + end + '...</p>';
             
             try {
-                // Load deltas and baselines for both dates
-                const [startDelta, endDelta] = await Promise.all([
-                    loadDeltaJSON(start),
-                    loadDeltaJSON(end)
-                ]);
+                // Load deltas and baselines for both dates; each baseline fetch starts as soon as its delta names it
+                const startDeltaPromise = loadDeltaJSON(start);
+                const endDeltaPromise = loadDeltaJSON(end);
+                const baselinePromises = [startDeltaPromise, endDeltaPromise].map(
+                    p => p.then(delta => delta && loadBaseline(delta.baseline_date)));
+                baselinePromises.forEach(p => p.catch(() => {})); // errors surface through the awaits below
+                const [startDelta, endDelta] = await Promise.all([startDeltaPromise, endDeltaPromise]);
                 
                 if (!startDelta || !endDelta) {
                     outputDiv.innerHTML = '<p style="color: red;">Error: Could not load delta JSONs for the selected dates.</p>';
@@ -3189,10 +3332,7 @@ def generate_delta_history(base_dir):
                 
                 // Load baselines (needed to reconstruct full character states)
                 outputDiv.innerHTML = '<p>Loading baselines... (this may take a moment)</p>';
-                const [startResult, endResult] = await Promise.all([
-                    loadBaseline(startDelta.baseline_date),
-                    loadBaseline(endDelta.baseline_date)
-                ]);
+                const [startResult, endResult] = await Promise.all(baselinePromises);
                 
                 if (!startResult || !endResult) {
                     outputDiv.innerHTML = '<p style="color: red;">Error: Could not load baseline JSONs. Baselines may not be available on GitHub Pages.</p>';
@@ -3204,12 +3344,14 @@ def generate_delta_history(base_dir):
                 
                 // Reconstruct full character states for both dates
                 outputDiv.innerHTML = '<p>Reconstructing character states...</p>';
+                // Everything from here to the final render is synchronous; yield once so the status paints first
+                await yieldToBrowser();
                 const startState = reconstructCharacterState(startBaseline, startDelta);
                 const endState = reconstructCharacterState(endBaseline, endDelta);
                 
-                // Compare the two reconstructed states
+                // Compare the two reconstructed states; class is resolved here (falling back to 'Unknown') once per character
                 const charChanges = {};
-                const allCharNames = new Set([...Object.keys(startState), ...Object.keys(endState)]);
+                const allCharNames = keyUnion(startState, endState);
                 
                 for (const charName of allCharNames) {
                     const startChar = startState[charName];
@@ -3223,7 +3365,7 @@ def generate_delta_history(base_dir):
                             hp: -startChar.hp,
                             current_level: 0,
                             previous_level: startChar.level,
-                            class: startChar.class,
+                            class: startChar.class || 'Unknown',
                             is_deleted: true
                         };
                         continue;
@@ -3237,7 +3379,9 @@ def generate_delta_history(base_dir):
                             hp: endChar.hp,
                             current_level: endChar.level,
                             previous_level: 0,
-                            class: endChar.class,
+                            current_aa: endChar.aa_total,
+                            current_hp: endChar.hp,
+                            class: endChar.class || 'Unknown',
                             is_new: true
                         };
                         continue;
@@ -3245,6 +3389,8 @@ def generate_delta_history(base_dir):
                     
                     // Character exists in both - compare values (anon = not in snapshot, so is_new/is_deleted cover that)
                     if (startChar && endChar) {
+                        // Same shared baseline record on both sides: untouched by either delta, so nothing changed
+                        if (startChar === endChar) continue;
                         const levelChange = endChar.level - startChar.level;
                         const aaChange = endChar.aa_total - startChar.aa_total;
                         const hpChange = endChar.hp - startChar.hp;
@@ -3256,7 +3402,9 @@ def generate_delta_history(base_dir):
                                 hp: hpChange,
                                 current_level: endChar.level,
                                 previous_level: startChar.level,
-                                class: endChar.class || startChar.class || ''
+                                current_aa: endChar.aa_total,
+                                current_hp: endChar.hp,
+                                class: endChar.class || startChar.class || 'Unknown'
                             };
                         }
                     }
@@ -3266,7 +3414,7 @@ def generate_delta_history(base_dir):
                 const invDeltas = {};
                 const startInv = startDelta.inv_deltas || {};
                 const endInv = endDelta.inv_deltas || {};
-                const allInvChars = new Set([...Object.keys(startInv), ...Object.keys(endInv)]);
+                const allInvChars = keyUnion(startInv, endInv);
                 for (const charName of allInvChars) {
                     const a = startInv[charName] || { added: {}, removed: {}, item_names: {} };
                     const b = endInv[charName] || { added: {}, removed: {}, item_names: {} };
@@ -3277,37 +3425,47 @@ def generate_delta_history(base_dir):
                     const addedItems = {};
                     const removedItems = {};
                     const itemNames = {};
-                    const get = (obj, k) => (typeof obj[k] !== 'undefined' ? Number(obj[k]) : 0);
-                    for (const itemId of Object.keys(bAdded)) {
-                        const count = get(bAdded, itemId);
-                        const aAdd = get(aAdded, itemId);
-                        if (count > aAdd) {
-                            addedItems[itemId] = count - aAdd;
-                            if (b.item_names && b.item_names[itemId]) itemNames[itemId] = b.item_names[itemId];
+                    const aNames = a.item_names || {};
+                    const bNames = b.item_names || {};
+                    // One pass over every id either side touched (for...in, no per-object key arrays)
+                    const itemIds = new Set();
+                    for (const itemId in bAdded) itemIds.add(itemId);
+                    for (const itemId in bRemoved) itemIds.add(itemId);
+                    for (const itemId in aAdded) itemIds.add(itemId);
+                    let changed = false;
+                    for (const itemId of itemIds) {
+                        const aAdd = +aAdded[itemId] || 0;
+                        const bRem = +bRemoved[itemId] || 0;
+                        let added = 0;
+                        let removed = 0;
+                        let name;
+                        // Net change since the range start: end-side counts beyond what the start already had
+                        const bAdd = +bAdded[itemId] || 0;
+                        if (bAdd > aAdd) {
+                            added = bAdd - aAdd;
+                            name = bNames[itemId];
                         }
-                    }
-                    for (const itemId of Object.keys(bRemoved)) {
-                        const count = get(bRemoved, itemId);
-                        const aRem = get(aRemoved, itemId);
-                        if (count > aRem) {
-                            removedItems[itemId] = count - aRem;
-                            if (b.item_names && b.item_names[itemId]) itemNames[itemId] = b.item_names[itemId];
+                        const aRem = +aRemoved[itemId] || 0;
+                        if (bRem > aRem) {
+                            removed = bRem - aRem;
+                            name = bNames[itemId] || name;
                         }
-                    }
-                    for (const itemId of Object.keys(aAdded)) {
-                        const count = get(aAdded, itemId);
-                        const bRem = get(bRemoved, itemId);
-                        if (bRem > 0) {
-                            const net = bRem - count;
+                        // Added by the start but removed by the end: the removal cancels (part of) the earlier gain
+                        if (bRem > 0 && itemId in aAdded) {
+                            const net = bRem - aAdd;
                             if (net > 0) {
-                                removedItems[itemId] = (removedItems[itemId] || 0) + net;
+                                removed += net;
                             } else if (net < 0) {
-                                addedItems[itemId] = (addedItems[itemId] || 0) + (-net);
+                                added -= net;
                             }
-                            if (a.item_names && a.item_names[itemId]) itemNames[itemId] = a.item_names[itemId];
+                            name = aNames[itemId] || name;
                         }
+                        if (added > 0) addedItems[itemId] = added;
+                        if (removed > 0) removedItems[itemId] = removed;
+                        if (added > 0 || removed > 0) changed = true;
+                        if (name) itemNames[itemId] = name;
                     }
-                    if (Object.keys(addedItems).length > 0 || Object.keys(removedItems).length > 0) {
+                    if (changed) {
                         const inStart = charName in startInv;
                         const inEnd = charName in endInv;
                         // Use reconstructed state: character in one snapshot but not the other = anon/visibility change
@@ -3334,7 +3492,7 @@ def generate_delta_history(base_dir):
                 const emStart = startDelta.equipped_worn_by_char;
                 const emEnd = endDelta.equipped_worn_by_char;
                 if (emStart && emEnd && typeof emStart === 'object' && typeof emEnd === 'object') {
-                    const names = new Set([...Object.keys(emStart), ...Object.keys(emEnd)]);
+                    const names = keyUnion(emStart, emEnd);
                     for (const charName of names) {
                         const sc = emStart[charName] && emStart[charName].count;
                         const ec = emEnd[charName] && emEnd[charName].count;
@@ -3365,13 +3523,13 @@ def generate_delta_history(base_dir):
                         const removed = {};
                         const itemNames = {};
                         for (const itemId of Object.keys(delta.added || {})) {
-                            if (TRACKED_ITEM_IDS.has(String(itemId))) {
+                            if (TRACKED_ITEM_IDS.has(itemId)) {
                                 added[itemId] = delta.added[itemId];
                                 if (delta.item_names && delta.item_names[itemId]) itemNames[itemId] = delta.item_names[itemId];
                             }
                         }
                         for (const itemId of Object.keys(delta.removed || {})) {
-                            if (TRACKED_ITEM_IDS.has(String(itemId))) {
+                            if (TRACKED_ITEM_IDS.has(itemId)) {
                                 removed[itemId] = delta.removed[itemId];
                                 if (delta.item_names && delta.item_names[itemId]) itemNames[itemId] = delta.item_names[itemId];
                             }
@@ -3398,10 +3556,10 @@ def generate_delta_history(base_dir):
                     for (const [charName, delta] of Object.entries(trackedDeltas)) {
                         if (!startState[charName] || !endState[charName] || delta.is_visibility_change) continue;
                         for (const itemId of Object.keys(delta.added || {})) {
-                            if (!NO_DROP_TRACKED_IDS.has(String(itemId)) && (netChangeTracked[itemId] || 0) <= 0) continue;
-                            const zone = TRACKED_ITEM_ZONE[String(itemId)];
+                            if (!NO_DROP_TRACKED_IDS.has(itemId) && (netChangeTracked[itemId] || 0) <= 0) continue;
+                            const zone = TRACKED_ITEM_ZONE[itemId];
                             if (!zone) continue;
-                            const mob = (TRACKED_ITEM_MOB && TRACKED_ITEM_MOB[String(itemId)]) || '';
+                            const mob = (TRACKED_ITEM_MOB && TRACKED_ITEM_MOB[itemId]) || '';
                             const count = delta.added[itemId];
                             const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
                             if (!zoneEntries[zone]) zoneEntries[zone] = {};
@@ -3412,18 +3570,36 @@ def generate_delta_history(base_dir):
                 }
                 
                 // Generate HTML report matching delta.html formatting
-                let reportHTML = `<h2 style="color: #333; border-bottom: 3px solid #2196F3; padding-bottom: 10px;">Date Range Report: ${start} to ${end}</h2>`;
+                // Collect each section's fragments and join them once when the section is shown
+                // (repeated += re-copies the growing report)
+                const reportParts = [`<h2 style="color: #333; border-bottom: 3px solid #2196F3; padding-bottom: 10px;">Date Range Report: ${start} to ${end}</h2>`];
+                
+                // Append the finished sections to the page (the first call replaces the progress message), then
+                // wait for them to paint before later sections are built. False if a newer report has started.
+                let reportShown = false;
+                const showSections = async () => {
+                    const html = reportParts.join('');
+                    reportParts.length = 0;
+                    if (reportShown) {
+                        outputDiv.insertAdjacentHTML('beforeend', html);
+                    } else {
+                        outputDiv.innerHTML = html;
+                        reportShown = true;
+                    }
+                    await yieldForPaint();
+                    return run === reportRun;
+                };
                 
                 if (usedFallbackBaseline) {
-                    reportHTML += `<p style="background: #fff3e0; padding: 10px; border-radius: 5px; margin: 10px 0; border-left: 4px solid #ff9800;">
+                    reportParts.push(`<p style="background: #fff3e0; padding: 10px; border-radius: 5px; margin: 10px 0; border-left: 4px solid #ff9800;">
                         <strong>⚠️ Historical baseline not found.</strong> The archived baseline for this date range (e.g. baseline_master_${startDelta.baseline_date}.json.gz) was not available (404). The <em>current</em> baseline was used instead. Character levels/AAs and visibility may be inaccurate for old dates. Inventory and tracked-item <em>diffs</em> between the two dates still come from the delta files; if those sections are empty below, delta files from this period may not include inventory data.
-                    </p>`;
+                    </p>`);
                 }
                 if (baselineMismatch) {
-                    reportHTML += `<p style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 10px 0; border-left: 4px solid #2196F3;">
+                    reportParts.push(`<p style="background: #e3f2fd; padding: 10px; border-radius: 5px; margin: 10px 0; border-left: 4px solid #2196F3;">
                         <strong>ℹ️ Different Baselines:</strong> These dates use different baselines (${startDelta.baseline_date} vs ${endDelta.baseline_date}).
                         <br>Full character states have been reconstructed by combining baseline + delta for accurate comparison.
-                    </p>`;
+                    </p>`);
                 }
                 // Collect all visibility-change names once (show once at top; sections below show only actual changes)
                 const sortedLevel1 = Object.keys(invDeltasLevel1).sort().slice(0, 500);
@@ -3438,60 +3614,65 @@ def generate_delta_history(base_dir):
                 const allVisNames = [...new Set([...visLevel1, ...visOthers, ...visTracked])].sort();
                 // Leaderboards: only consider characters present in BOTH start and end state (explicit presence)
                 const charsInBoth = new Set(Object.keys(startState).filter(c => c in endState));
-                reportHTML += `<p style="margin: 10px 0;">${Object.keys(zoneEntries).length > 0 ? '<a href="#items-by-zone" style="margin-right: 10px;">📍 Items by Zone</a>' : ''}
+                reportParts.push(`<p style="margin: 10px 0;">${Object.keys(zoneEntries).length > 0 ? '<a href="#items-by-zone" style="margin-right: 10px;">📍 Items by Zone</a>' : ''}
                     <a href="#aa-leaderboard" style="margin-right: 10px;">🏆 AA Leaderboard</a>
                     <a href="#hp-leaderboard" style="margin-right: 10px;">❤️ HP Leaderboard</a>
                     <a href="#character-changes" style="margin-right: 10px;">Character Changes</a>
                     ${allVisNames.length > 0 ? '<a href="#visibility-note" style="margin-right: 10px; color: #757575;">Visibility (anon)</a>' : ''}
                     ${nonVisLevel1.length > 0 ? '<a href="#inventory-changes-level1" style="margin-right: 10px;">Level 1 (Mules)</a>' : ''}
                     <a href="#inventory-changes" style="margin-right: 10px;">Inventory Changes</a>
-                    ${nonVisTracked.length > 0 ? '<a href="#tracked-items" style="margin-right: 10px; background-color: #FF9800;">📌 Tracked Items</a>' : ''}</p>`;
+                    ${nonVisTracked.length > 0 ? '<a href="#tracked-items" style="margin-right: 10px; background-color: #FF9800;">📌 Tracked Items</a>' : ''}</p>`);
                 if (allVisNames.length > 0) {
-                    reportHTML += `<details id="visibility-note" style="color: #757575; margin: 15px 0; padding: 10px; background: #fafafa; border-radius: 5px; border-left: 4px solid #9e9e9e;"><summary style="cursor: pointer; font-style: italic;"><strong>Visibility change (anon ↔ not anon)</strong> — ${allVisNames.length} character(s); their inventory and tracked item deltas are not listed below. Click to expand names.</summary><p style="margin: 8px 0 0 0; font-size: 0.9em;">${allVisNames.join(', ')}</p></details>`;
+                    reportParts.push(`<details id="visibility-note" style="color: #757575; margin: 15px 0; padding: 10px; background: #fafafa; border-radius: 5px; border-left: 4px solid #9e9e9e;"><summary style="cursor: pointer; font-style: italic;"><strong>Visibility change (anon ↔ not anon)</strong> — ${allVisNames.length} character(s); their inventory and tracked item deltas are not listed below. Click to expand names.</summary><p style="margin: 8px 0 0 0; font-size: 0.9em;">${allVisNames.join(', ')}</p></details>`);
                 }
                 // Items by zone (at top; raid + elemental + praesterium), with mob subheadings
                 if (Object.keys(zoneEntries).length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="items-by-zone" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">📍 Items by Zone</h2>
-                    <p><em>Tracked loot (raid, elemental, praesterium) acquired this period, grouped by zone and mob. Only characters present in both snapshots.</em></p>`;
+                    <p><em>Tracked loot (raid, elemental, praesterium) acquired this period, grouped by zone and mob. Only characters present in both snapshots.</em></p>`);
                     for (const zone of Object.keys(zoneEntries).sort()) {
                         const mobs = zoneEntries[zone];
-                        reportHTML += `
-                    <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #f5f5f5;">
-                        <h3 style="margin-top: 0;">${zone}</h3>`;
+                        reportParts.push(`
+                    <div class="drt-card drt-card-zone">
+                        <h3 class="drt-card-title">${zone}</h3>`);
                         const mobKeys = Object.keys(mobs).sort((a, b) => (a === '' ? 1 : b === '' ? -1 : a.localeCompare(b)));
                         for (const mob of mobKeys) {
                             const entries = mobs[mob];
-                            if (mob) reportHTML += `
-                        <h4 style="margin: 12px 0 6px 0; font-size: 1em; color: #555;">${mob}</h4>`;
-                            reportHTML += `
-                        <ul style="margin: 0; padding-left: 20px;">`;
+                            if (mob) reportParts.push(`
+                        <h4 class="drt-mob">${mob}</h4>`);
+                            reportParts.push(`
+                        <ul class="drt-zone-list">`);
                             for (const e of entries) {
                                 const state = endState[e.charName] || startState[e.charName] || {};
                                 const guild = state.guild || '';
                                 const charDisplay = guild ? (e.charName + ' &lt;' + guild + '&gt;') : e.charName;
                                 const charSlug = e.charName.toLowerCase().replace(/ /g, '_');
                                 const mageloUrl = 'https://www.takproject.net/magelo/character.php?char=' + encodeURIComponent(charSlug);
-                                const itemUrl = 'https://www.takproject.net/allaclone/item.php?id=' + e.itemId;
-                                reportHTML += `<li><a href="${mageloUrl}" target="_blank" style="text-decoration: none; font-weight: bold;">${charDisplay}</a> — <a href="${itemUrl}" target="_blank" style="color: #2e7d32;">${e.name}</a></li>`;
+                                const itemUrl = ITEM_URL_PREFIX + e.itemId;
+                                reportParts.push(`<li><a href="${mageloUrl}" target="_blank" class="drt-char-link">${charDisplay}</a> — <a href="${itemUrl}" target="_blank" class="drt-zone-item">${e.name}</a></li>`);
                             }
-                            reportHTML += `
-                        </ul>`;
+                            reportParts.push(`
+                        </ul>`);
                         }
-                        reportHTML += `
-                    </div>`;
+                        reportParts.push(`
+                    </div>`);
                     }
                 }
                 const noInventoryOrTrackedBlocks = nonVisLevel1.length === 0 && nonVisOthers.length === 0 && nonVisTracked.length === 0;
                 if (noInventoryOrTrackedBlocks && (Object.keys(invDeltasLevel1).length > 0 || Object.keys(invDeltasOthers).length > 0 || Object.keys(trackedDeltas).length > 0)) {
-                    reportHTML += `<p style="color: #757575; font-style: italic; margin: 10px 0;">No inventory or tracked item changes to list for this range. For date ranges outside the current baseline period, delta files from that time may not include inventory data, or all changes in this range are visibility-only (see above).</p>`;
+                    reportParts.push(`<p style="color: #757575; font-style: italic; margin: 10px 0;">No inventory or tracked item changes to list for this range. For date ranges outside the current baseline period, delta files from that time may not include inventory data, or all changes in this range are visibility-only (see above).</p>`);
                 }
                 
+                if (!(await showSections())) return;
+                
                 // Calculate leaderboards (matching delta.html format)
-                const aaLeaderboard = [];
-                const hpLeaderboard = [];
+                const aaTop = new TopK(20);
+                const hpTop = new TopK(20);
+                // Sorted once; used here (ties then rank alphabetically) and for the character changes table
+                const sortedCharNames = Object.keys(charChanges).sort();
                 
-                for (const [charName, changes] of Object.entries(charChanges)) {
+                for (const charName of sortedCharNames) {
+                    const changes = charChanges[charName];
                     if (changes.is_deleted || changes.is_new) continue;
                     if (!charsInBoth.has(charName)) continue;
                     if (corpseLootChars.has(charName)) continue;
@@ -3503,131 +3684,89 @@ def generate_delta_history(base_dir):
                     
                     // AA leaderboard (level 50+)
                     if ((currentLevel >= 50 || previousLevel >= 50) && aaGain > 0) {
-                        const endChar = endState[charName];
-                        aaLeaderboard.push({
+                        aaTop.offer(aaGain, () => ({
                             name: charName,
-                            class: changes.class || 'Unknown',
+                            class: changes.class,
                             level: currentLevel,
                             aa_gain: aaGain,
-                            aa_total: endChar ? endChar.aa_total : 0
-                        });
+                            aa_total: changes.current_aa
+                        }));
                     }
                     
                     // HP leaderboard (any level)
                     if (hpGain > 0) {
-                        hpLeaderboard.push({
+                        hpTop.offer(hpGain, () => ({
                             name: charName,
-                            class: changes.class || 'Unknown',
+                            class: changes.class,
                             level: currentLevel,
                             hp_gain: hpGain,
-                            hp_total: endState[charName]?.hp || 0
-                        });
+                            hp_total: changes.current_hp || 0
+                        }));
                     }
                 }
                 
-                // Sort leaderboards
-                aaLeaderboard.sort((a, b) => b.aa_gain - a.aa_gain);
-                hpLeaderboard.sort((a, b) => b.hp_gain - a.hp_gain);
+                const aaLeaderboard = aaTop.sorted();
+                const hpLeaderboard = hpTop.sorted();
                 
                 // AA Leaderboard
                 if (aaLeaderboard.length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <div class="leaderboard" id="aa-leaderboard" style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
                         <h2 style="color: white; border-bottom: 2px solid rgba(255,255,255,0.3); padding-bottom: 10px; margin-top: 0;">🏆 Top AA Gainers</h2>
-                        <table class="leaderboard-table" style="width: 100%; border-collapse: collapse; background-color: rgba(255,255,255,0.1); border-radius: 5px; overflow: hidden;">
-                            <thead>
-                                <tr>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Rank</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Character</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Class</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Level</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">AA Gained</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Total AA</th>
-                                </tr>
-                            </thead>
-                            <tbody>`;
+                        <table class="leaderboard-table" style="width: 100%; border-collapse: collapse; background-color: rgba(255,255,255,0.1); border-radius: 5px; overflow: hidden;">`, AA_LEADERBOARD_HEAD, `
+                            <tbody>`);
                     for (let idx = 0; idx < Math.min(20, aaLeaderboard.length); idx++) {
                         const entry = aaLeaderboard[idx];
-                        const rankClass = idx === 0 ? 'rank-1' : idx === 1 ? 'rank-2' : idx === 2 ? 'rank-3' : 'rank-other';
-                        const rankStyle = idx === 0 ? 'background-color: #FFD700; color: #000;' : 
-                                         idx === 1 ? 'background-color: #C0C0C0; color: #000;' : 
-                                         idx === 2 ? 'background-color: #CD7F32; color: #fff;' : 
-                                         'background-color: rgba(255,255,255,0.3); color: #fff;';
-                        reportHTML += `
-                                <tr style="border-bottom: 1px solid rgba(255,255,255,0.1);">
-                                    <td style="padding: 10px 12px;"><span style="display: inline-block; width: 30px; height: 30px; line-height: 30px; text-align: center; border-radius: 50%; font-weight: bold; ${rankStyle}">${idx + 1}</span></td>
-                                    <td style="padding: 10px 12px;"><strong>${entry.name}</strong></td>
-                                    <td style="padding: 10px 12px;">${entry.class}</td>
-                                    <td style="padding: 10px 12px;">${entry.level}</td>
-                                    <td style="padding: 10px 12px; color: #4CAF50; font-weight: bold;">+${entry.aa_gain}</td>
-                                    <td style="padding: 10px 12px;">${entry.aa_total || '—'}</td>
-                                </tr>`;
+                        reportParts.push(`
+                                <tr class="drt-lead-row">
+                                    <td class="drt-lead-td"><span class="${RANK_CLASSES[Math.min(idx, 3)]}">${idx + 1}</span></td>
+                                    <td class="drt-lead-td"><strong>${entry.name}</strong></td>
+                                    <td class="drt-lead-td">${entry.class}</td>
+                                    <td class="drt-lead-td">${entry.level}</td>
+                                    <td class="drt-lead-td drt-lead-aa-gain">+${entry.aa_gain}</td>
+                                    <td class="drt-lead-td">${entry.aa_total || '—'}</td>
+                                </tr>`);
                     }
-                    reportHTML += `
+                    reportParts.push(`
                             </tbody>
                         </table>
-                    </div>`;
+                    </div>`);
                 }
                 
                 // HP Leaderboard
                 if (hpLeaderboard.length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <div class="leaderboard" id="hp-leaderboard" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); color: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
                         <h2 style="color: white; border-bottom: 2px solid rgba(255,255,255,0.3); padding-bottom: 10px; margin-top: 0;">❤️ Top HP Gainers</h2>
-                        <table class="leaderboard-table" style="width: 100%; border-collapse: collapse; background-color: rgba(255,255,255,0.1); border-radius: 5px; overflow: hidden;">
-                            <thead>
-                                <tr>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Rank</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Character</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Class</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Level</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">HP Gained</th>
-                                    <th style="background-color: rgba(255,255,255,0.2); padding: 12px; text-align: left; font-weight: bold;">Total HP</th>
-                                </tr>
-                            </thead>
-                            <tbody>`;
+                        <table class="leaderboard-table" style="width: 100%; border-collapse: collapse; background-color: rgba(255,255,255,0.1); border-radius: 5px; overflow: hidden;">`, HP_LEADERBOARD_HEAD, `
+                            <tbody>`);
                     for (let idx = 0; idx < Math.min(20, hpLeaderboard.length); idx++) {
                         const entry = hpLeaderboard[idx];
-                        const rankClass = idx === 0 ? 'rank-1' : idx === 1 ? 'rank-2' : idx === 2 ? 'rank-3' : 'rank-other';
-                        const rankStyle = idx === 0 ? 'background-color: #FFD700; color: #000;' : 
-                                         idx === 1 ? 'background-color: #C0C0C0; color: #000;' : 
-                                         idx === 2 ? 'background-color: #CD7F32; color: #fff;' : 
-                                         'background-color: rgba(255,255,255,0.3); color: #fff;';
-                        reportHTML += `
-                                <tr style="border-bottom: 1px solid rgba(255,255,255,0.1);">
-                                    <td style="padding: 10px 12px;"><span style="display: inline-block; width: 30px; height: 30px; line-height: 30px; text-align: center; border-radius: 50%; font-weight: bold; ${rankStyle}">${idx + 1}</span></td>
-                                    <td style="padding: 10px 12px;"><strong>${entry.name}</strong></td>
-                                    <td style="padding: 10px 12px;">${entry.class}</td>
-                                    <td style="padding: 10px 12px;">${entry.level}</td>
-                                    <td style="padding: 10px 12px; color: #fff; font-weight: bold;">+${entry.hp_gain}</td>
-                                    <td style="padding: 10px 12px;">${entry.hp_total || '—'}</td>
-                                </tr>`;
+                        reportParts.push(`
+                                <tr class="drt-lead-row">
+                                    <td class="drt-lead-td"><span class="${RANK_CLASSES[Math.min(idx, 3)]}">${idx + 1}</span></td>
+                                    <td class="drt-lead-td"><strong>${entry.name}</strong></td>
+                                    <td class="drt-lead-td">${entry.class}</td>
+                                    <td class="drt-lead-td">${entry.level}</td>
+                                    <td class="drt-lead-td drt-lead-hp-gain">+${entry.hp_gain}</td>
+                                    <td class="drt-lead-td">${entry.hp_total || '—'}</td>
+                                </tr>`);
                     }
-                    reportHTML += `
+                    reportParts.push(`
                             </tbody>
                         </table>
-                    </div>`;
+                    </div>`);
                 }
                 
+                if (!(await showSections())) return;
+                
                 // Character Changes Table (matching delta.html format)
-                if (Object.keys(charChanges).length > 0) {
-                    reportHTML += `
+                if (sortedCharNames.length > 0) {
+                    reportParts.push(`
                     <h2 id="character-changes" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">Character Level & AA Changes</h2>
-                    <table class="delta-table" style="width: 100%; border-collapse: collapse; margin: 20px 0;">
-                        <thead>
-                            <tr>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">Character</th>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">Class</th>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">Level</th>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">Level Change</th>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">Total AA</th>
-                                <th style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd; background-color: #f0f0f0; font-weight: bold;">AA Total Change</th>
-                            </tr>
-                        </thead>
-                        <tbody>`;
+                    <table class="delta-table" style="width: 100%; border-collapse: collapse; margin: 20px 0;">`, CHAR_CHANGES_HEAD, `
+                        <tbody>`);
                     
-                    // Sort characters alphabetically
-                    const sortedCharNames = Object.keys(charChanges).sort();
                     for (const charName of sortedCharNames) {
                         const changes = charChanges[charName];
                         if (!charsInBoth.has(charName)) continue;
@@ -3649,13 +3788,13 @@ def generate_delta_history(base_dir):
                         // Level change display
                         let levelDisplay;
                         if (isDeleted) {
-                            levelDisplay = `<span style="color: #f44336; font-weight: bold;">Deleted (was ${previousLevel})</span>`;
+                            levelDisplay = `<span class="drt-gain-neg">Deleted (was ${previousLevel})</span>`;
                         } else if (previousLevel === 65) {
-                            levelDisplay = `<span style="color: #666;">—</span>`;
+                            levelDisplay = `<span class="drt-muted">—</span>`;
                         } else {
-                            const levelClass = changes.level > 0 ? 'color: #4CAF50; font-weight: bold;' : changes.level < 0 ? 'color: #f44336; font-weight: bold;' : 'color: #666;';
+                            const levelClass = changes.level > 0 ? 'drt-gain-pos' : changes.level < 0 ? 'drt-gain-neg' : 'drt-muted';
                             const levelText = changes.level > 0 ? `+${changes.level}` : String(changes.level);
-                            levelDisplay = `<span style="${levelClass}">${levelText} (${previousLevel} → ${currentLevel})</span>`;
+                            levelDisplay = `<span class="${levelClass}">${levelText} (${previousLevel} → ${currentLevel})</span>`;
                         }
                         
                         // Total AA display
@@ -3663,166 +3802,202 @@ def generate_delta_history(base_dir):
                         if (isDeleted) {
                             totalAADisplay = `<span style="color: #999;">—</span>`;
                         } else if (currentLevel >= 50 || previousLevel >= 50) {
-                            // Need to calculate total AA from end state
-                            const endChar = endState[charName];
-                            totalAADisplay = String(endChar ? endChar.aa_total : '—');
+                            // End-state total AA, captured during the state comparison
+                            totalAADisplay = String(changes.current_aa);
                         } else {
-                            totalAADisplay = `<span style="color: #666;">—</span>`;
+                            totalAADisplay = `<span class="drt-muted">—</span>`;
                         }
                         
                         // AA change display
                         let aaDisplay;
                         if (isDeleted) {
-                            aaDisplay = `<span style="color: #f44336; font-weight: bold;">—</span>`;
+                            aaDisplay = `<span class="drt-gain-neg">—</span>`;
                         } else if (currentLevel >= 50 || previousLevel >= 50) {
-                            const aaClass = changes.aa > 0 ? 'color: #4CAF50; font-weight: bold;' : changes.aa < 0 ? 'color: #f44336; font-weight: bold;' : 'color: #666;';
+                            const aaClass = changes.aa > 0 ? 'drt-gain-pos' : changes.aa < 0 ? 'drt-gain-neg' : 'drt-muted';
                             const aaText = changes.aa > 0 ? `+${changes.aa}` : String(changes.aa);
-                            aaDisplay = `<span style="${aaClass}">${aaText}</span>`;
+                            aaDisplay = `<span class="${aaClass}">${aaText}</span>`;
                         } else {
-                            aaDisplay = `<span style="color: #666;">—</span>`;
+                            aaDisplay = `<span class="drt-muted">—</span>`;
                         }
                         
-                        reportHTML += `
+                        reportParts.push(`
                             <tr>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${charDisplay}</td>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${changes.class || 'Unknown'}</td>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${isDeleted ? previousLevel : currentLevel}</td>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${levelDisplay}</td>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${totalAADisplay}</td>
-                                <td style="padding: 10px; text-align: left; border-bottom: 1px solid #ddd;">${aaDisplay}</td>
-                            </tr>`;
+                                <td class="drt-td">${charDisplay}</td>
+                                <td class="drt-td">${changes.class}</td>
+                                <td class="drt-td">${isDeleted ? previousLevel : currentLevel}</td>
+                                <td class="drt-td">${levelDisplay}</td>
+                                <td class="drt-td">${totalAADisplay}</td>
+                                <td class="drt-td">${aaDisplay}</td>
+                            </tr>`);
                     }
                     
-                    reportHTML += `
+                    reportParts.push(`
                         </tbody>
-                    </table>`;
+                    </table>`);
                 } else {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="character-changes" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">Character Level & AA Changes</h2>
-                    <p style="color: #999; font-style: italic;">No level or AA changes detected.</p>`;
+                    <p style="color: #999; font-style: italic;">No level or AA changes detected.</p>`);
                 }
                 
+                // One Level 1 character card (header plus added/removed item badges)
+                const pushLevel1Card = (cardParts, charName) => {
+                    const delta = invDeltasLevel1[charName];
+                    const addedKeys = Object.keys(delta.added || {});
+                    const removedKeys = Object.keys(delta.removed || {});
+                    cardParts.push(`
+                    <div class="drt-card drt-card-level1">
+                        <h3 class="drt-card-title"><strong>${charName}</strong> <span class="drt-note">(Level 1)</span></h3>`);
+                    if (addedKeys.length > 0) {
+                        cardParts.push(`
+                        <div class="drt-side"><strong class="drt-added-label">Items Added:</strong><div class="drt-items">`);
+                        for (const itemId of addedKeys.sort()) {
+                            const count = delta.added[itemId];
+                            const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
+                            const countText = count > 1 ? ' x' + count : '';
+                            cardParts.push(ADDED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_END);
+                        }
+                        cardParts.push(`</div></div>`);
+                    }
+                    if (removedKeys.length > 0) {
+                        cardParts.push(`
+                        <div class="drt-side"><strong class="drt-removed-label">Items Removed:</strong><div class="drt-items">`);
+                        for (const itemId of removedKeys.sort()) {
+                            const count = delta.removed[itemId];
+                            const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
+                            const countText = count > 1 ? ' x' + count : '';
+                            cardParts.push(REMOVED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_END);
+                        }
+                        cardParts.push(`</div></div>`);
+                    }
+                    cardParts.push(`</div>`);
+                };
+                
+                if (!(await showSections())) return;
+                
                 // Level 1 inventory changes (mules/traders) — only actual changes (visibility list shown once above); skip section if no blocks
                 if (nonVisLevel1.length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="inventory-changes-level1" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">Level 1 Inventory Changes (Mules/Traders)</h2>
-                    <p><em>Showing level 1 characters with inventory changes (limited to 500)</em></p>`;
-                    for (const charName of nonVisLevel1) {
-                        const delta = invDeltasLevel1[charName];
-                        reportHTML += `
-                    <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #fff9e6;">
-                        <h3 style="margin-top: 0;"><strong>${charName}</strong> <span style="color: #666; font-size: 0.9em;">(Level 1)</span></h3>`;
-                        if (Object.keys(delta.added || {}).length > 0) {
-                            reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #4CAF50;">Items Added:</strong><div style="margin-top: 5px;">`;
-                            for (const itemId of Object.keys(delta.added).sort()) {
-                                const count = delta.added[itemId];
-                                const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
-                                const countText = count > 1 ? ' x' + count : '';
-                                reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #e8f5e9; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #2e7d32;">${name}</a>${countText}</span>`;
-                            }
-                            reportHTML += `</div></div>`;
-                        }
-                        if (Object.keys(delta.removed || {}).length > 0) {
-                            reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #f44336;">Items Removed:</strong><div style="margin-top: 5px;">`;
-                            for (const itemId of Object.keys(delta.removed).sort()) {
-                                const count = delta.removed[itemId];
-                                const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
-                                const countText = count > 1 ? ' x' + count : '';
-                                reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #ffebee; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #c62828;">${name}</a>${countText}</span>`;
-                            }
-                            reportHTML += `</div></div>`;
-                        }
-                        reportHTML += `</div>`;
+                    <p><em>Showing level 1 characters with inventory changes (limited to 500)</em></p>`, '<div id="inv-level1-cards">');
+                    // First batch inline; the rest is appended in idle time so a 500-card section doesn't block first paint
+                    for (const charName of nonVisLevel1.slice(0, LEVEL1_CARD_BATCH)) {
+                        pushLevel1Card(reportParts, charName);
                     }
+                    reportParts.push('</div>');
                 }
                 
+                if (!(await showSections())) return;
+                
                 // Regular inventory changes (non-level 1) — only actual changes; show section with message when no blocks
                 if (nonVisOthers.length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="inventory-changes" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">Inventory Changes</h2>
-                    <p><em>Showing characters with inventory changes (limited to 500)</em></p>`;
+                    <p><em>Showing characters with inventory changes (limited to 500)</em></p>`);
                     for (const charName of nonVisOthers) {
                         const delta = invDeltasOthers[charName];
-                        reportHTML += `
-                    <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px;">
-                        <h3 style="margin-top: 0;"><strong>${charName}</strong></h3>`;
-                        if (Object.keys(delta.added || {}).length > 0) {
-                                reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #4CAF50;">Items Added:</strong><div style="margin-top: 5px;">`;
-                                for (const itemId of Object.keys(delta.added).sort()) {
+                        const addedKeys = Object.keys(delta.added || {});
+                        const removedKeys = Object.keys(delta.removed || {});
+                        reportParts.push(`
+                    <div class="drt-card">
+                        <h3 class="drt-card-title"><strong>${charName}</strong></h3>`);
+                        if (addedKeys.length > 0) {
+                                reportParts.push(`
+                        <div class="drt-side"><strong class="drt-added-label">Items Added:</strong><div class="drt-items">`);
+                                for (const itemId of addedKeys.sort()) {
                                     const count = delta.added[itemId];
                                     const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
                                     const countText = count > 1 ? ' x' + count : '';
-                                    reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #e8f5e9; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #2e7d32;">${name}</a>${countText}</span>`;
+                                    reportParts.push(ADDED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_END);
                                 }
-                                reportHTML += `</div></div>`;
+                                reportParts.push(`</div></div>`);
                         }
-                        if (Object.keys(delta.removed || {}).length > 0) {
-                            reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #f44336;">Items Removed:</strong><div style="margin-top: 5px;">`;
-                            for (const itemId of Object.keys(delta.removed).sort()) {
+                        if (removedKeys.length > 0) {
+                            reportParts.push(`
+                        <div class="drt-side"><strong class="drt-removed-label">Items Removed:</strong><div class="drt-items">`);
+                            for (const itemId of removedKeys.sort()) {
                                 const count = delta.removed[itemId];
                                 const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
                                 const countText = count > 1 ? ' x' + count : '';
-                                reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #ffebee; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #c62828;">${name}</a>${countText}</span>`;
+                                reportParts.push(REMOVED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_END);
                             }
-                            reportHTML += `</div></div>`;
+                            reportParts.push(`</div></div>`);
                         }
-                        reportHTML += `</div>`;
+                        reportParts.push(`</div>`);
                     }
                 } else {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="inventory-changes" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">Inventory Changes</h2>
-                    <p style="color: #999; font-style: italic;">${Object.keys(invDeltas).length === 0 ? 'No inventory changes detected.' : 'No inventory changes to list (only visibility changes in this range).'}</p>`;
+                    <p style="color: #999; font-style: italic;">${Object.keys(invDeltas).length === 0 ? 'No inventory changes detected.' : 'No inventory changes to list (only visibility changes in this range).'}</p>`);
                 }
                 
+                if (!(await showSections())) return;
+                
                 // Tracked Items section — only actual changes; skip section if no blocks
                 if (nonVisTracked.length > 0) {
-                    reportHTML += `
+                    reportParts.push(`
                     <h2 id="tracked-items" style="color: #555; margin-top: 30px; border-bottom: 2px solid #ddd; padding-bottom: 5px;">📌 Tracked Items (Raid / Elemental Armor / Praesterium)</h2>
-                    <p><em>Changes in raid loot, elemental armor, and praesterium items — see who acquired or lost these.</em></p>`;
+                    <p><em>Changes in raid loot, elemental armor, and praesterium items — see who acquired or lost these.</em></p>`);
+                    const sourceLabels = TRACKED_SOURCE_LABEL || {};
                     for (const charName of nonVisTracked) {
                         const delta = trackedDeltas[charName];
+                        const addedKeys = Object.keys(delta.added || {});
+                        const removedKeys = Object.keys(delta.removed || {});
                         const state = endState[charName] || startState[charName] || {};
                         const level = state.level || '?';
                         const guild = state.guild || '';
                         const charDisplay = guild ? (charName + ' &lt;' + guild + '&gt;') : charName;
                         const charSlug = charName.toLowerCase().replace(/ /g, '_');
                         const mageloUrl = 'https://www.takproject.net/magelo/character.php?char=' + encodeURIComponent(charSlug);
-                        reportHTML += `
-                    <div style="margin: 20px 0; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #fff8e1;">
-                        <h3 style="margin-top: 0;"><a href="${mageloUrl}" target="_blank" style="text-decoration: none; font-weight: bold;">${charDisplay}</a> <span style="color: #666; font-size: 0.9em;">(Level ${level})</span></h3>`;
-                        if (Object.keys(delta.added || {}).length > 0) {
-                            reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #4CAF50;">Acquired:</strong><div style="margin-top: 5px;">`;
-                            for (const itemId of Object.keys(delta.added).sort()) {
+                        reportParts.push(`
+                    <div class="drt-card drt-card-tracked">
+                        <h3 class="drt-card-title"><a href="${mageloUrl}" target="_blank" class="drt-char-link">${charDisplay}</a> <span class="drt-note">(Level ${level})</span></h3>`);
+                        if (addedKeys.length > 0) {
+                            reportParts.push(`
+                        <div class="drt-side"><strong class="drt-added-label">Acquired:</strong><div class="drt-items">`);
+                            for (const itemId of addedKeys.sort()) {
                                 const count = delta.added[itemId];
                                 const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
                                 const countText = count > 1 ? ' x' + count : '';
-                                const source = (TRACKED_SOURCE_LABEL && TRACKED_SOURCE_LABEL[String(itemId)]) ? ' (' + TRACKED_SOURCE_LABEL[String(itemId)] + ')' : '';
-                                reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #e8f5e9; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #2e7d32;">${name}</a>${countText}<span style="color: #888; font-size: 0.85em;">${source}</span></span>`;
+                                const label = sourceLabels[itemId];
+                                const source = label ? ' (' + label + ')' : '';
+                                reportParts.push(ADDED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_SOURCE_OPEN, source, BADGE_END, BADGE_END);
                             }
-                            reportHTML += `</div></div>`;
+                            reportParts.push(`</div></div>`);
                         }
-                        if (Object.keys(delta.removed || {}).length > 0) {
-                            reportHTML += `
-                        <div style="margin: 10px 0;"><strong style="color: #f44336;">Lost:</strong><div style="margin-top: 5px;">`;
-                            for (const itemId of Object.keys(delta.removed).sort()) {
+                        if (removedKeys.length > 0) {
+                            reportParts.push(`
+                        <div class="drt-side"><strong class="drt-removed-label">Lost:</strong><div class="drt-items">`);
+                            for (const itemId of removedKeys.sort()) {
                                 const count = delta.removed[itemId];
                                 const name = (delta.item_names && delta.item_names[itemId]) || ('Item ' + itemId);
                                 const countText = count > 1 ? ' x' + count : '';
-                                const source = (TRACKED_SOURCE_LABEL && TRACKED_SOURCE_LABEL[String(itemId)]) ? ' (' + TRACKED_SOURCE_LABEL[String(itemId)] + ')' : '';
-                                reportHTML += `<span style="display: inline-block; margin: 2px 4px 2px 0; padding: 2px 8px; background: #ffebee; border-radius: 4px;"><a href="https://www.takproject.net/allaclone/item.php?id=${itemId}" target="_blank" style="color: #c62828;">${name}</a>${countText}<span style="color: #888; font-size: 0.85em;">${source}</span></span>`;
+                                const label = sourceLabels[itemId];
+                                const source = label ? ' (' + label + ')' : '';
+                                reportParts.push(REMOVED_BADGE_OPEN, itemId, BADGE_LINK_MID, name, BADGE_LINK_END, countText, BADGE_SOURCE_OPEN, source, BADGE_END, BADGE_END);
                             }
-                            reportHTML += `</div></div>`;
+                            reportParts.push(`</div></div>`);
                         }
-                        reportHTML += `</div>`;
+                        reportParts.push(`</div>`);
                     }
                 }
                 
-                outputDiv.innerHTML = reportHTML;
+                if (!(await showSections())) return;
+                if (nonVisLevel1.length > LEVEL1_CARD_BATCH) {
+                    const container = document.getElementById('inv-level1-cards');
+                    const renderBatch = (from) => {
+                        // Stop if a newer report replaced this one
+                        if (run !== reportRun || !container) return;
+                        const cardParts = [];
+                        const to = Math.min(from + LEVEL1_CARD_BATCH, nonVisLevel1.length);
+                        for (let i = from; i < to; i++) {
+                            pushLevel1Card(cardParts, nonVisLevel1[i]);
+                        }
+                        container.insertAdjacentHTML('beforeend', cardParts.join(''));
+                        if (to < nonVisLevel1.length) whenIdle(() => renderBatch(to));
+                    };
+                    whenIdle(() => renderBatch(LEVEL1_CARD_BATCH));
+                }
             } catch (error) {
                 outputDiv.innerHTML = `<p style="color: red; padding: 15px; background: #ffebee; border-radius: 5px;">
                     <strong>Error:</strong> ${error.message}<br>
@@ -3832,14 +4007,145 @@ def generate_delta_history(base_dir):
         }
         
     </script>
-""" + GOATCOUNTER_SCRIPT + """
+"""
+
+# One clickable tile of the "Available Dates" grid; values are internal (ISO dates and month names), so no escaping
+_DATE_ENTRY_TMPL = """
+                <div class="delta-entry" style="flex-direction: column; align-items: flex-start; cursor: pointer;" 
+                     onclick="document.getElementById('start_date').value='{date}'; document.getElementById('end_date').value='{date}';">
+                    <strong>{fmt}</strong>
+                    <div class="delta-date">{date}</div>
+                </div>
+"""
+
+
+def _script_json(obj):
+    """Compact, key-sorted JSON for an inline <script type="application/json"> block ("</" escaped).
+    Uses orjson when installed; the stdlib fallback is configured to produce the same text."""
+    if HAS_ORJSON:
+        text = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+    else:
+        text = json.dumps(obj, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+    return text.replace("</", "<\\/")
+
+
+@lru_cache(maxsize=1)
+def _tracked_json_payloads():
+    """Embedded JSON for the history page's tracked-item lookups, encoded once per process.
+    Returns (tracked ids, source labels, item zones, item mobs, no-drop tracked ids); id lists are sorted
+    so the page is byte-stable between runs."""
+    tracked_ids, tracked_source_label, item_zone, item_mob = load_tracked_item_ids()
+    # Tracked item IDs that are NO DROP (for mob kill verification: non-no-drop only counts when net change > 0)
+    no_drop_tracked = load_no_drop_tracked_item_ids() & tracked_ids if tracked_ids else set()
+    return (
+        _script_json(sorted(tracked_ids)),
+        _script_json(tracked_source_label),
+        _script_json(item_zone),
+        _script_json(item_mob),
+        _script_json(sorted(no_drop_tracked)),
+    )
+
+
+def generate_delta_history(base_dir):
+    """Generate a history page listing all available daily delta JSON files.
+    Allows generating date-to-date delta comparisons on demand."""
+    
+    # Load tracked item IDs so we can embed them for the client-side report (Tracked Items + Items by zone)
+    (tracked_ids_json, tracked_source_json, tracked_item_zone_json, tracked_item_mob_json,
+     no_drop_tracked_json) = _tracked_json_payloads()
+    
+    # Find all daily delta JSON files (delta_daily_YYYY-MM-DD.json.gz) in one directory scan
+    delta_snapshots_dir = os.path.join(base_dir, 'delta_snapshots')
+    delta_entries = []
+    if os.path.isdir(delta_snapshots_dir):
+        with os.scandir(delta_snapshots_dir) as it:
+            for de in it:
+                match = _DELTA_FN_RE.match(de.name)
+                if not match:
+                    continue
+                date_str = match.group(1)
+                try:
+                    date_formatted = _fmt_date(date_str)
+                except ValueError:
+                    continue
+                delta_entries.append({
+                    'date': date_str,
+                    'date_formatted': date_formatted,
+                    'filename': de.name,
+                })
+    
+    # Sort by date (newest first)
+    delta_entries.sort(key=itemgetter('date'), reverse=True)
+    
+    # Generate HTML with date-to-date comparison interface
+    parts = [_DELTA_HISTORY_HEAD, """<body>
+    <div class="container">
+        <h1>📜 TAKP Delta History & Date Range Generator</h1>
+        <div class="nav-links">
+            <a href="delta.html">← Current Delta Report</a>
+            <a href="spell_inventory.html">← Spell Inventory</a>
+        </div>
+        
+        <div class="info-box">
+            <strong>ℹ️ How it works:</strong> Historical deltas are stored as JSON files (much smaller than HTML). 
+            Use the form below to generate a date-to-date comparison report for any date range. 
+            The report will be reconstructed from daily delta JSONs on demand.
+        </div>
+        
+        <div class="date-range-form">
+            <h3>Generate Date-to-Date Delta Report</h3>
+            <p>Select start and end dates, then use the generated command to create a date range report:</p>
+            <div class="form-group">
+                <label for="start_date">Start Date:</label>
+                <input type="date" id="start_date" name="start" required>
+            </div>
+            <div class="form-group">
+                <label for="end_date">End Date:</label>
+                <input type="date" id="end_date" name="end" required>
+            </div>
+            <div class="form-group">
+                <button type="button" onclick="generateDateRangeReport()" style="background: #4CAF50; color: white; padding: 8px 16px; border: none; border-radius: 4px; cursor: pointer;">Generate Report</button>
+            </div>
+            <div id="date_range_output" style="margin-top: 20px; padding: 15px; background: #f9f9f9; border-radius: 5px; min-height: 50px;"></div>
+        </div>
+        
+        <div class="stats">
+            <strong>Available Daily Delta JSON Files:</strong> """, str(len(delta_entries)), """
+            <br><small>These JSON files contain daily changes and can be used to reconstruct any date range.</small>
+        </div>
+        
+        <div class="delta-list">
+            <h2>Available Dates</h2>
+"""]
+    
+    if delta_entries:
+        parts.append("            <p>Click on a date to use it in the date range form above:</p>\n")
+        parts.append("            <div style='display: grid; grid-template-columns: repeat(auto-fill, minmax(200px, 1fr)); gap: 10px; margin-top: 15px;'>\n")
+        entry = _DATE_ENTRY_TMPL.format
+        parts.append(''.join(entry(date=e['date'], fmt=e['date_formatted']) for e in delta_entries))
+        parts.append("            </div>\n")
+    else:
+        parts.append("""
+            <p>No daily delta JSON files found yet. Daily deltas will appear here once they are generated.</p>
+            <p><em>Note: Daily delta JSONs are automatically saved when the delta report is generated.</em></p>
+""")
+    
+    parts.extend(("""
+        </div>
+    </div>
+    <script type="application/json" id="tracked-item-ids">""", tracked_ids_json, """</script>
+    <script type="application/json" id="tracked-source-label">""", tracked_source_json, """</script>
+    <script type="application/json" id="tracked-item-zone">""", tracked_item_zone_json, """</script>
+    <script type="application/json" id="tracked-item-mob">""", tracked_item_mob_json, """</script>
+    <script type="application/json" id="no-drop-tracked-ids">""", no_drop_tracked_json, """</script>
+""", _DELTA_HISTORY_SCRIPT, GOATCOUNTER_SCRIPT, """
 </body>
 </html>
-"""
+"""))
     
     history_file = os.path.join(base_dir, "delta-history.html")
     with open(history_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+        f.write(''.join(parts))
     return history_file
 
 def find_latest_magelo_file(directory, pattern=None):
@@ -3847,28 +4153,30 @@ def find_latest_magelo_file(directory, pattern=None):
     if not os.path.exists(directory):
         return None
     
+    # One scandir pass: DirEntry caches the file type and stat from the directory read
     files = []
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        if os.path.isfile(filepath) and filename.endswith('.txt'):
-            # Check if it matches pattern or is a TAKP export file
-            if pattern is None or pattern in filename or filename.startswith('TAKP_'):
-                files.append((filepath, os.path.getmtime(filepath)))
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith('.txt'):
+                # Check if it matches pattern or is a TAKP export file
+                if pattern is None or pattern in entry.name or entry.name.startswith('TAKP_'):
+                    files.append((entry.path, entry.stat().st_mtime))
     
     if not files:
         return None
     
     # Return the most recently modified file
-    files.sort(key=lambda x: x[1], reverse=True)
-    return files[0][0]
+    return max(files, key=itemgetter(1))[0]
+
+# Daily export filename: M_D_YY.txt or M_D_YYYY.txt
+_FN_DATE_RE = re.compile(r'(\d+)_(\d+)_(\d+)\.txt')
 
+@lru_cache(maxsize=4096)
 def parse_date_from_filename(filename):
     """Parse date from filename like '2_6_26.txt' -> (month, day, year).
     Returns (month, day, year) tuple or None if not parseable."""
-    import re
     basename = os.path.basename(filename)
-    # Match pattern M_D_YY.txt or M_D_YYYY.txt
-    match = re.match(r'(\d+)_(\d+)_(\d+)\.txt', basename)
+    match = _FN_DATE_RE.match(basename)
     if match:
         month = int(match.group(1))
         day = int(match.group(2))
@@ -3879,6 +4187,7 @@ def parse_date_from_filename(filename):
         return (month, day, year)
     return None
 
+@lru_cache(maxsize=4096)
 def get_yesterday_filename(current_filename):
     """Given a current filename like '2_6_26.txt', return yesterday's filename.
     Returns None if date cannot be parsed."""
@@ -3888,7 +4197,6 @@ def get_yesterday_filename(current_filename):
     
     month, day, year = date_tuple
     try:
-        from datetime import datetime, timedelta
         current_date = datetime(year, month, day)
         yesterday = current_date - timedelta(days=1)
         # Format as M_D_YY (2-digit year)
@@ -3920,34 +4228,30 @@ def main():
     output_file = os.path.join(base_dir, "spell_inventory.html")
     
     # Try to find the latest files, prioritizing current files over previous files
-    # First, look for current files (not _previous)
+    # First, look for current files (not _previous); one scandir pass each, DirEntry caches type and stat
     all_char_files = []
     all_inv_files = []
     
     if os.path.exists(char_dir):
-        for filename in os.listdir(char_dir):
-            if filename.endswith('.txt') and '_previous' not in filename:
-                filepath = os.path.join(char_dir, filename)
-                if os.path.isfile(filepath):
-                    all_char_files.append((filepath, os.path.getmtime(filepath)))
+        with os.scandir(char_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.txt') and '_previous' not in entry.name and entry.is_file():
+                    all_char_files.append((entry.path, entry.stat().st_mtime))
     
     if os.path.exists(inv_dir):
-        for filename in os.listdir(inv_dir):
-            if filename.endswith('.txt') and '_previous' not in filename:
-                filepath = os.path.join(inv_dir, filename)
-                if os.path.isfile(filepath):
-                    all_inv_files.append((filepath, os.path.getmtime(filepath)))
+        with os.scandir(inv_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.txt') and '_previous' not in entry.name and entry.is_file():
+                    all_inv_files.append((entry.path, entry.stat().st_mtime))
     
-    # Sort by modification time and get the most recent
+    # Pick the most recently modified (first listed wins a tie, as the former stable sort did)
     if all_char_files:
-        all_char_files.sort(key=lambda x: x[1], reverse=True)
-        char_file = all_char_files[0][0]
+        char_file = max(all_char_files, key=itemgetter(1))[0]
     else:
         char_file = find_latest_magelo_file(char_dir, "TAKP_character") or find_latest_magelo_file(char_dir)
     
     if all_inv_files:
-        all_inv_files.sort(key=lambda x: x[1], reverse=True)
-        inv_file = all_inv_files[0][0]
+        inv_file = max(all_inv_files, key=itemgetter(1))[0]
     else:
         inv_file = find_latest_magelo_file(inv_dir, "TAKP_character_inventory") or find_latest_magelo_file(inv_dir)
     
@@ -3970,33 +4274,46 @@ def main():
     print(f"Using character file: {os.path.basename(char_file)}")
     print(f"Using inventory file: {os.path.basename(inv_file)}")
     
-    print("Loading spell exchange data...")
-    spell_info, spell_data = load_spell_exchange_data()
-    print(f"Loaded {len(spell_info)} unique PoK spells")
-    
-    print(f"Parsing character file: {os.path.basename(char_file)}...")
-    char_ids = parse_character_file(char_file, MULE_CHARACTERS)
-    print(f"Found {len(char_ids)} mule characters: {', '.join(sorted(char_ids.keys()))}")
-    
-    # Parse officer mule characters
-    officer_char_ids = parse_character_file(char_file, OFFICER_MULE_CHARACTERS)
-    print(f"Found {len(officer_char_ids)} officer mule characters: {', '.join(sorted(officer_char_ids.keys()))}")
-    
-    print(f"Parsing inventory file: {os.path.basename(inv_file)}...")
-    inventories = parse_inventory_file(inv_file, char_ids)
-    print(f"Found inventories for {len(inventories)} mule characters")
-    
-    # Parse officer mule inventories
-    officer_inventories = parse_inventory_file(inv_file, officer_char_ids) if officer_char_ids else None
-    if officer_inventories:
-        print(f"Found inventories for {len(officer_inventories)} officer mule characters")
-    
-    print("Generating HTML...")
-    html = generate_html(char_ids, inventories, spell_info, officer_char_ids, officer_inventories)
-    
-    print(f"Writing HTML to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # Skip the spell page when its inputs (and this script) are unchanged since the last run
+    spell_json = find_spell_exchange_json()
+    input_hash = None
+    if spell_json is not None:
+        input_hash = compute_input_hash(
+            [spell_json, char_file, inv_file, os.path.abspath(__file__)],
+            os.environ.get('MAGELO_UPDATE_DATE', 'Unknown'),
+        )
+    if input_hash is not None and read_output_input_hash(output_file) == input_hash:
+        print(f"Inputs unchanged since last run, keeping {output_file}")
+    else:
+        print("Loading spell exchange data...")
+        spell_info, spell_data = load_spell_exchange_data()
+        print(f"Loaded {len(spell_info)} unique PoK spells")
+        
+        print(f"Parsing character file: {os.path.basename(char_file)}...")
+        char_ids = parse_character_file(char_file, MULE_CHARACTERS_SET)
+        print(f"Found {len(char_ids)} mule characters: {', '.join(sorted(char_ids.keys()))}")
+        
+        # Parse officer mule characters
+        officer_char_ids = parse_character_file(char_file, OFFICER_MULE_CHARACTERS_SET)
+        print(f"Found {len(officer_char_ids)} officer mule characters: {', '.join(sorted(officer_char_ids.keys()))}")
+        
+        print(f"Parsing inventory file: {os.path.basename(inv_file)}...")
+        inventories = parse_inventory_file(inv_file, char_ids)
+        print(f"Found inventories for {len(inventories)} mule characters")
+        
+        # Parse officer mule inventories
+        officer_inventories = parse_inventory_file(inv_file, officer_char_ids) if officer_char_ids else None
+        if officer_inventories:
+            print(f"Found inventories for {len(officer_inventories)} officer mule characters")
+        
+        print("Generating HTML...")
+        html = generate_html(char_ids, inventories, spell_info, officer_char_ids, officer_inventories,
+                             input_hash=input_hash)
+        
+        print(f"Writing HTML to {output_file}...")
+        # Encode once and write the bytes in one buffered call (no text-layer newline translation)
+        with open(output_file, 'wb', buffering=1 << 20) as f:
+            f.write(html.encode('utf-8'))
     
     # Try to generate delta page if previous day's files exist
     # Priority: 1) Yesterday's dated file, 2) _previous files, 3) prototype files
@@ -4050,14 +4367,15 @@ def main():
         
         # Parse ALL character data (serverwide, not just mules)
         # Pass None to get all characters
-        print("Parsing all characters (serverwide) for delta comparison...")
-        previous_char_data = parse_character_data(previous_char_file, None)
-        current_char_data = parse_character_data(current_char_file, None)
+        # Previous and current exports are independent, so parse them in two processes
+        print("Parsing all characters and inventories (serverwide) for delta comparison...")
+        (previous_char_data, previous_inventories), (current_char_data, current_inventories) = parse_serverwide_exports(
+            [(previous_char_file, previous_inv_file), (current_char_file, current_inv_file)]
+        )
         print(f"Found {len(previous_char_data)} characters in previous, {len(current_char_data)} in current")
         
         # Check if files are identical
         if os.path.exists(previous_char_file) and os.path.exists(current_char_file):
-            import hashlib
             prev_hash = hashlib.md5(open(previous_char_file, 'rb').read()).hexdigest()
             curr_hash = hashlib.md5(open(current_char_file, 'rb').read()).hexdigest()
             if prev_hash == curr_hash:
@@ -4065,30 +4383,6 @@ def main():
             else:
                 print(f"Files are different (prev hash: {prev_hash[:8]}..., curr hash: {curr_hash[:8]}...)")
         
-        # Parse ALL inventories (serverwide)
-        previous_char_ids = {}
-        current_char_ids = {}
-        with open(previous_char_file, 'r', encoding='utf-8') as f:
-            next(f)  # Skip header
-            for line in f:
-                parts = line.strip().split('\t')
-                if len(parts) >= 9:
-                    name = parts[0]
-                    char_id = parts[8]
-                    previous_char_ids[name] = char_id
-        
-        with open(current_char_file, 'r', encoding='utf-8') as f:
-            next(f)  # Skip header
-            for line in f:
-                parts = line.strip().split('\t')
-                if len(parts) >= 9:
-                    name = parts[0]
-                    char_id = parts[8]
-                    current_char_ids[name] = char_id
-        
-        # Parse all inventories
-        previous_inventories = parse_inventory_file(previous_inv_file, previous_char_ids) if previous_char_ids else {}
-        current_inventories = parse_inventory_file(current_inv_file, current_char_ids) if current_char_ids else {}
         print(f"Found {len(previous_inventories)} characters with inventory in previous, {len(current_inventories)} in current")
         
         # Get magelo update date
@@ -4139,7 +4433,6 @@ def main():
         today_delta = load_daily_delta_json(date_str, delta_snapshots_dir)
         
         # Calculate yesterday's date
-        from datetime import timedelta
         today_dt = datetime.strptime(date_str, '%Y-%m-%d')
         yesterday_dt = today_dt - timedelta(days=1)
         yesterday_date_str = yesterday_dt.strftime('%Y-%m-%d')
@@ -4181,27 +4474,7 @@ def main():
         
         # Ensure visibility change (anon 0 vs large AA/level) is set when char_deltas came from JSON/delta-to-delta
         apply_visibility_change_to_char_deltas(char_deltas)
-        
-        # Get item names for inventory deltas
-        all_item_ids = set()
-        for char_delta in inv_deltas.values():
-            all_item_ids.update(char_delta.get('added', {}).keys())
-            all_item_ids.update(char_delta.get('removed', {}).keys())
-        
-        item_names = {}
-        for char_name, items in current_inventories.items():
-            for item in items:
-                if item['item_id'] in all_item_ids:
-                    item_names[item['item_id']] = item['item_name']
-        
-        # Populate item names in deltas
-        for char_delta in inv_deltas.values():
-            for item_id in char_delta.get('added', {}):
-                if item_id in item_names:
-                    char_delta.setdefault('item_names', {})[item_id] = item_names[item_id]
-            for item_id in char_delta.get('removed', {}):
-                if item_id in item_names:
-                    char_delta.setdefault('item_names', {})[item_id] = item_names[item_id]
+
         
         # Generate delta HTML (and append mob deaths for tracker when we have zone loot)
         mob_tracker_path = os.path.join(base_dir, "mob_tracker_deaths.json")
@@ -4215,23 +4488,25 @@ def main():
                 observed_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
         else:
             observed_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-        delta_html = generate_delta_html(
-            current_char_data, previous_char_data,
-            current_inventories, previous_inventories,
-            magelo_update_date,
-            serverwide=True,
-            char_deltas=char_deltas,
-            inv_deltas=inv_deltas,
-            mob_tracker_deaths_path=mob_tracker_path,
-            observed_at=observed_at,
-            raid_item_sources_path=raid_sources_path,
-            corpse_loot_chars=corpse_loot_override,
-        )
-        
         delta_file = os.path.join(base_dir, "delta.html")
         print(f"Writing delta HTML to {delta_file}...")
-        with open(delta_file, 'w', encoding='utf-8') as f:
-            f.write(delta_html)
+        # Stream parts straight to disk; write to a temp file so a failure keeps the previous page
+        delta_tmp = delta_file + ".tmp"
+        with open(delta_tmp, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            generate_delta_html(
+                current_char_data, previous_char_data,
+                current_inventories, previous_inventories,
+                magelo_update_date,
+                serverwide=True,
+                char_deltas=char_deltas,
+                inv_deltas=inv_deltas,
+                mob_tracker_deaths_path=mob_tracker_path,
+                observed_at=observed_at,
+                raid_item_sources_path=raid_sources_path,
+                corpse_loot_chars=corpse_loot_override,
+                out=f,
+            )
+        os.replace(delta_tmp, delta_file)
         print("Delta page generated successfully!")
         
         mob_tracker_file = os.path.join(base_dir, "mob_tracker.html")
@@ -4384,8 +4659,6 @@ def main():
     print("Done!")
 
 if __name__ == "__main__":
-    import sys
-    
     # Check if we're generating a date range delta
     if len(sys.argv) >= 3 and sys.argv[1] == "--date-range":
         start_date = sys.argv[2]